@@ -0,0 +1,124 @@
+"""
+Trans Rights are Human Rights
+
+Binary sprite atlas format shared by image_convert.py (writer) and the host side tools (reader).
+    main.py has its own minimal reader for the Pico, keep the two in sync.
+
+    HEADER  "<4sBBHH"      magic, version, flags, palette entries, sprite count
+    PALETTE palette entries * 3 bytes of raw RGB, gamma is applied on the device
+    INDEX   sprite count * "<16sBBBBII"  name, width, height, encoding, reserved, data offset, data size
+    DATA    one palette index per pixel, row by row, either raw or run length encoded as (count, index) pairs
+"""
+# SYSTEM IMPORTS
+import pathlib
+import struct
+
+# STANDARD LIBRARY IMPORTS
+
+# LOCAL APPLICATION IMPORTS
+
+
+MAGIC = b"PSPR"
+VERSION = 1
+HEADER_FORMAT = "<4sBBHH"
+INDEX_FORMAT = "<16sBBBBII"
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+INDEX_SIZE = struct.calcsize(INDEX_FORMAT)
+NAME_SIZE = 16
+
+ENCODING_RAW = 0
+ENCODING_RLE = 1
+
+DEFAULT_ATLAS_PATH = pathlib.Path(pathlib.Path(__file__).parents[0], "assets", "sprites.bin")
+
+
+def rle_encode(data: bytes) -> bytes:
+    encoded = bytearray()
+    i = 0
+    while i < len(data):
+        value = data[i]
+        run = 1
+        while i + run < len(data) and data[i + run] == value and run < 255:
+            run += 1
+        encoded += bytes((run, value))
+        i += run
+    return bytes(encoded)
+
+
+def rle_decode(data: bytes) -> bytes:
+    decoded = bytearray()
+    for i in range(0, len(data), 2):
+        decoded += bytes((data[i + 1],)) * data[i]
+    return bytes(decoded)
+
+
+def pack_atlas(palette: list, sprites: list, use_rle: bool = True) -> bytes:
+    """
+    palette: [(r, g, b), ...]
+    sprites: [(name, width, height, index_bytes), ...] in sprite ID order
+    RLE is only used for a sprite when it actually comes out smaller.
+    """
+    if len(palette) > 256:
+        raise ValueError(f"{len(palette)} colours won't fit in a one byte palette index")
+
+    header = struct.pack(HEADER_FORMAT, MAGIC, VERSION, 0, len(palette), len(sprites))
+    palette_bytes = b"".join(bytes(colour) for colour in palette)
+
+    data_offset = HEADER_SIZE + len(palette_bytes) + INDEX_SIZE * len(sprites)
+    index = bytearray()
+    data = bytearray()
+    for name, width, height, pixels in sprites:
+        encoded_name = name.encode("ascii")
+        if len(encoded_name) > NAME_SIZE:
+            raise ValueError(f"sprite name {name} is longer than {NAME_SIZE} characters")
+        if len(pixels) != width * height:
+            raise ValueError(f"sprite {name} has {len(pixels)} pixels, expected {width * height}")
+
+        encoding, payload = ENCODING_RAW, pixels
+        if use_rle:
+            rle = rle_encode(pixels)
+            if len(rle) < len(pixels):
+                encoding, payload = ENCODING_RLE, rle
+
+        index += struct.pack(INDEX_FORMAT, encoded_name, width, height, encoding, 0,
+                             data_offset + len(data), len(payload))
+        data += payload
+
+    return header + palette_bytes + bytes(index) + bytes(data)
+
+
+def read_index(atlas_bytes: bytes) -> (list, list):
+    # Returns (palette, [(name, width, height, encoding, offset, size), ...])
+    magic, version, _, palette_size, sprite_count = struct.unpack_from(HEADER_FORMAT, atlas_bytes, 0)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"not a version {VERSION} sprite atlas")
+
+    palette_bytes = atlas_bytes[HEADER_SIZE:HEADER_SIZE + palette_size * 3]
+    palette = [tuple(palette_bytes[i:i + 3]) for i in range(0, len(palette_bytes), 3)]
+
+    entries = []
+    index_start = HEADER_SIZE + palette_size * 3
+    for sprite in range(sprite_count):
+        name, width, height, encoding, _, offset, size = struct.unpack_from(
+            INDEX_FORMAT, atlas_bytes, index_start + sprite * INDEX_SIZE)
+        entries.append((name.rstrip(b"\0").decode("ascii"), width, height, encoding, offset, size))
+
+    return palette, entries
+
+
+def unpack_atlas(atlas_bytes: bytes) -> (list, dict):
+    # Returns (palette, {name: (width, height, index_bytes)})
+    palette, entries = read_index(atlas_bytes)
+    sprites = {}
+    for name, width, height, encoding, offset, size in entries:
+        payload = atlas_bytes[offset:offset + size]
+        pixels = rle_decode(payload) if encoding == ENCODING_RLE else bytes(payload)
+        sprites[name] = (width, height, pixels)
+
+    return palette, sprites
+
+
+def load_sprite_names(path=DEFAULT_ATLAS_PATH) -> list:
+    # Sprite names in ID order, as used by protocol.CMD_SHOW_SPRITE
+    _, entries = read_index(pathlib.Path(path).read_bytes())
+    return [name for name, *_ in entries]
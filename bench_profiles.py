@@ -0,0 +1,79 @@
+"""
+Trans Rights are Human Rights
+
+Compares the tracking profiles (face_track.TRACKING_PROFILES) on the same frames. Each profile loads FaceMesh with
+    its own settings, so a profile that doesn't need the irises also skips the iris refinement model, and then runs
+    the landmark fill and pose math for just its outputs.
+
+    python bench_profiles.py --video clip.mp4
+    python bench_profiles.py --profiles full blink_mouth --frames 600 --json profiles.json
+"""
+# SYSTEM IMPORTS
+import argparse
+import json
+import time
+
+# STANDARD LIBRARY IMPORTS
+
+# LOCAL APPLICATION IMPORTS
+import face_track
+from bench_replay import print_results, summarize
+from mp_inference import frame_source
+
+
+def bench_profile(profile_name: str, frames: list) -> list:
+    import cv2
+
+    face_track.tracking_profile = face_track.TRACKING_PROFILES[profile_name]
+    landmarks = face_track.new_landmark_frame()
+    height, width = frames[0].shape[:2]
+    timings = {"face_mesh_process": [], "fill": [], "estimate_pose": []}
+
+    perf_counter_ns = time.perf_counter_ns
+    with face_track.load_face_mesh(face_track.tracking_profile.facemesh_kwargs()) as face_mesh:
+        # Let the model load and the tracker lock on before starting the clock
+        face_mesh.process(cv2.cvtColor(frames[0], cv2.COLOR_BGR2RGB))
+        for image in frames:
+            rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+            start = perf_counter_ns()
+            result = face_mesh.process(rgb)
+            timings["face_mesh_process"].append(perf_counter_ns() - start)
+            if not result.multi_face_landmarks:
+                continue
+
+            start = perf_counter_ns()
+            landmarks.fill(result.multi_face_landmarks[0].landmark)
+            timings["fill"].append(perf_counter_ns() - start)
+
+            start = perf_counter_ns()
+            face_track.estimate_pose(landmarks, frame_width=width, frame_height=height, print_pose=False)
+            timings["estimate_pose"].append(perf_counter_ns() - start)
+
+    return [summarize(name, profile_timings) for name, profile_timings in timings.items() if profile_timings]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark FaceMesh and the pose math for each tracking profile")
+    parser.add_argument("--video", help="video file to read frames from, defaults to the webcam")
+    parser.add_argument("--frames", type=int, default=300, help="frames to run through each profile")
+    parser.add_argument("--profiles", nargs="+", choices=face_track.TRACKING_PROFILES,
+                        default=list(face_track.TRACKING_PROFILES), help="profiles to compare")
+    parser.add_argument("--json", metavar="PATH", help="also write the results as JSON")
+    args = parser.parse_args()
+
+    source_frames = list(frame_source(args.video, args.frames))
+    if not source_frames:
+        parser.error("no frames to benchmark with")
+
+    all_results = {}
+    for name in args.profiles:
+        profile = face_track.TRACKING_PROFILES[name]
+        print(f"\n{name}: {len(profile.required_landmarks())} landmarks, refine_landmarks={profile.needs_iris}, "
+              f"head_pose={profile.head_pose}")
+        results = bench_profile(name, source_frames)
+        print_results(results)
+        all_results[name] = results
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(all_results, f, indent=1)
@@ -0,0 +1,140 @@
+"""
+Trans Rights are Human Rights
+
+Offline replay benchmark for the pose math. Feeds a landmark recording (see recording.py, record one with
+    `python face_track.py --record session.plmk`) through the pose layer as fast as possible and reports per function
+    latency percentiles and throughput. Needs no webcam, so it can run on any Linux box.
+
+    python bench_replay.py session.plmk
+    python bench_replay.py --synthetic 2000 --json results.json
+"""
+# SYSTEM IMPORTS
+import argparse
+import json
+import os
+import tempfile
+import time
+
+# STANDARD LIBRARY IMPORTS
+import numpy
+
+# LOCAL APPLICATION IMPORTS
+import face_track
+import proto_math
+from recording import Recording, write_synthetic_recording
+
+
+def summarize(name: str, timings_ns: list) -> dict:
+    timings_us = numpy.asarray(timings_ns, dtype=numpy.float64) / 1000
+    total_s = timings_us.sum() / 1e6
+    return {
+        "name": name,
+        "calls": len(timings_us),
+        "p50_us": float(numpy.percentile(timings_us, 50)),
+        "p95_us": float(numpy.percentile(timings_us, 95)),
+        "p99_us": float(numpy.percentile(timings_us, 99)),
+        "max_us": float(timings_us.max()),
+        "calls_per_s": len(timings_us) / total_s if total_s else 0.0,
+    }
+
+
+def recording_profile(recording: Recording, profile_name: str = None) -> str:
+    """
+    The tracking profile to replay a recording with: profile_name if given, else the one stored in the recording.
+    Older recordings don't store one, those without the iris landmarks get no_iris.
+    """
+    name = profile_name or recording.profile
+    if not name:
+        name = "full" if recording.n_landmarks > max(face_track.TRACKING_PROFILES["full"].required_landmarks()) \
+            else "no_iris"
+    needed = max(face_track.TRACKING_PROFILES[name].required_landmarks())
+    if needed >= recording.n_landmarks:
+        raise ValueError(f"{recording.path} has {recording.n_landmarks} landmarks, profile {name} needs landmark "
+                         f"{needed}")
+    return name
+
+
+def bench_recording(recording: Recording, repeat: int = 1, head_pose: bool = True) -> list:
+    # Uses face_track.tracking_profile, set it with recording_profile() first
+    head_pose = head_pose and face_track.tracking_profile.head_pose
+    width = recording.frame_width
+    height = recording.frame_height
+    points = recording.points
+    landmarks = face_track.new_landmark_frame()
+    timings = {"fill_from_array": [], "pose_handler": [], "get_eye_ear_equation": []}
+    if head_pose:
+        timings["face_direction_estimation"] = []
+
+    perf_counter_ns = time.perf_counter_ns
+    for _ in range(repeat):
+        for frame_points in points:
+            start = perf_counter_ns()
+            landmarks.fill_from_array(frame_points)
+            timings["fill_from_array"].append(perf_counter_ns() - start)
+
+            start = perf_counter_ns()
+            face_track.pose_handler(landmarks, frame_width=width, frame_height=height, print_pose=False)
+            timings["pose_handler"].append(perf_counter_ns() - start)
+
+            start = perf_counter_ns()
+            proto_math.get_eye_ear_equation(landmarks, face_track.LEFT_EYE_IDXS,
+                                            frame_width=width, frame_height=height)
+            timings["get_eye_ear_equation"].append(perf_counter_ns() - start)
+
+            if head_pose:
+                start = perf_counter_ns()
+                face_track.face_direction_estimation(landmarks, frame_width=width, frame_height=height)
+                timings["face_direction_estimation"].append(perf_counter_ns() - start)
+
+    return [summarize(name, function_timings) for name, function_timings in timings.items()]
+
+
+def print_results(results: list) -> None:
+    print(f"{'function':<28}{'calls':>8}{'p50 us':>10}{'p95 us':>10}{'p99 us':>10}{'max us':>10}{'calls/s':>12}")
+    for result in results:
+        print(f"{result['name']:<28}{result['calls']:>8}{result['p50_us']:>10.1f}{result['p95_us']:>10.1f}"
+              f"{result['p99_us']:>10.1f}{result['max_us']:>10.1f}{result['calls_per_s']:>12.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay landmark recordings through the pose math")
+    parser.add_argument("recordings", nargs="*", help="recordings made with face_track.py --record")
+    parser.add_argument("--synthetic", type=int, metavar="FRAMES", help="benchmark a synthetic recording instead")
+    parser.add_argument("--repeat", type=int, default=1, help="replay each recording this many times")
+    parser.add_argument("--no-head-pose", action="store_true", help="skip face_direction_estimation")
+    parser.add_argument("--tracking-profile", choices=face_track.TRACKING_PROFILES,
+                        help="profile to replay with, defaults to the one the recording was made with")
+    parser.add_argument("--json", metavar="PATH", help="also write the results as JSON")
+    args = parser.parse_args()
+
+    paths = list(args.recordings)
+    synthetic_path = None
+    if args.synthetic:
+        synthetic_fd, synthetic_path = tempfile.mkstemp(suffix=".plmk")
+        os.close(synthetic_fd)
+        write_synthetic_recording(synthetic_path, frames=args.synthetic)
+        paths.append(synthetic_path)
+    if not paths:
+        parser.error("give at least one recording or --synthetic FRAMES")
+
+    all_results = {}
+    try:
+        for path in paths:
+            recording = Recording(path)
+            try:
+                profile_name = recording_profile(recording, args.tracking_profile)
+            except ValueError as e:
+                parser.error(str(e))
+            face_track.tracking_profile = face_track.TRACKING_PROFILES[profile_name]
+            print(f"\n{path}: {len(recording)} frames at {recording.frame_width}x{recording.frame_height}, "
+                  f"{profile_name} profile")
+            results = bench_recording(recording, repeat=args.repeat, head_pose=not args.no_head_pose)
+            print_results(results)
+            all_results[path] = results
+    finally:
+        if synthetic_path:
+            os.remove(synthetic_path)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(all_results, f, indent=1)
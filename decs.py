@@ -1,9 +1,13 @@
 """
 Trans Rights are Human Rights
 
-A small collection of function decorators
+A small collection of function decorators, and a low overhead profiler for the hot path.
 """
 # SYSTEM IMPORTS
+import array
+import json
+import socket
+import sys
 import time
 
 # STANDARD LIBRARY IMPORTS
@@ -13,16 +17,165 @@ import time
 
 def timeit(method):
     def timed(*args, **kw):
-        time_start = time.time()
+        # log_time/log_name are for the decorator, don't forward them to the wrapped function
+        log_time = kw.pop('log_time', None)
+        log_name = kw.pop('log_name', method.__name__.upper())
+
+        time_start = time.perf_counter()
         result = method(*args, **kw)
-        time_end = time.time()
+        method_time = (time.perf_counter() - time_start) * 1000
 
-        if 'log_time' in kw:
-            name = kw.get('log_name', method.__name__.upper())
-            kw['log_time'][name] = int((time_end - time_start) * 1000)
+        if log_time is not None:
+            log_time[log_name] = int(method_time)
         else:
-            method_time = (time_end - time_start) * 1000
             print(method.__name__, f"{method_time:.2f}")
         return result
 
     return timed
+
+
+class SpanStats:
+    # Fixed size ring buffer of span durations in nanoseconds
+    def __init__(self, name: str, size: int):
+        self.name = name
+        self.durations = array.array('q', bytes(8 * size))
+        self.size = size
+        self.position = 0
+        self.count = 0
+        self._exported_count = 0
+
+    def add(self, duration_ns: int) -> None:
+        self.durations[self.position] = duration_ns
+        self.position = (self.position + 1) % self.size
+        self.count += 1
+
+    def percentiles(self, *percents) -> list:
+        filled = sorted(self.durations[:min(self.count, self.size)])
+        if not filled:
+            return [0.0 for _ in percents]
+        return [filled[min(int(len(filled) * percent / 100), len(filled) - 1)] / 1e6 for percent in percents]
+
+    def summary(self, elapsed_s: float) -> dict:
+        p50, p95, p99 = self.percentiles(50, 95, 99)
+        fps = (self.count - self._exported_count) / elapsed_s if elapsed_s > 0 else 0.0
+        self._exported_count = self.count
+        return {"p50_ms": p50, "p95_ms": p95, "p99_ms": p99, "fps": fps, "count": self.count}
+
+
+class _Span:
+    __slots__ = ("stats", "start")
+
+    def __init__(self, stats: SpanStats):
+        self.stats = stats
+        self.start = 0
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stats.add(time.perf_counter_ns() - self.start)
+        return False
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+NULL_SPAN = _NullSpan()
+
+
+class Profiler:
+    """
+    Named spans timed with perf_counter_ns into per span ring buffers.
+    When disabled span() hands back a shared do nothing context manager, so it can stay in the hot path.
+
+    sink: "stdout", "udp://host:port" or a file path (JSON lines are appended)
+    """
+    def __init__(self, enabled: bool = False, window: int = 256, sink: str = "stdout", export_interval: float = 5.0):
+        self.enabled = enabled
+        self.window = window
+        self.sink = sink
+        self.export_interval = export_interval
+        self.spans = {}
+        self._last_export = time.perf_counter()
+        self._socket = None
+        self._udp_address = None
+
+    def configure(self, enabled: bool = True, sink: str = None, export_interval: float = None) -> None:
+        self.enabled = enabled
+        if sink is not None:
+            self.sink = sink
+            self._udp_address = None
+        if export_interval is not None:
+            self.export_interval = export_interval
+        self._last_export = time.perf_counter()
+
+    def span(self, name: str):
+        if not self.enabled:
+            return NULL_SPAN
+        stats = self.spans.get(name)
+        if stats is None:
+            stats = self.spans[name] = SpanStats(name, self.window)
+        return _Span(stats)
+
+    def record(self, name: str, duration_ns: int) -> None:
+        # For timings measured somewhere else, e.g. a pipeline stage
+        if not self.enabled:
+            return
+        stats = self.spans.get(name)
+        if stats is None:
+            stats = self.spans[name] = SpanStats(name, self.window)
+        stats.add(duration_ns)
+
+    def summary(self) -> dict:
+        now = time.perf_counter()
+        elapsed = now - self._last_export
+        self._last_export = now
+        return {name: stats.summary(elapsed) for name, stats in self.spans.items()}
+
+    def tick(self) -> None:
+        # Call once per frame, exports whenever export_interval has passed
+        if self.enabled and time.perf_counter() - self._last_export >= self.export_interval:
+            self.export()
+
+    def export(self) -> None:
+        line = json.dumps({"time": time.time(), "spans": self.summary()})
+        if self.sink == "stdout":
+            sys.stdout.write(line + "\n")
+        elif self.sink.startswith("udp://"):
+            if self._udp_address is None:
+                host, _, port = self.sink[len("udp://"):].rpartition(":")
+                self._udp_address = (host, int(port))
+                self._socket = self._socket or socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self._socket.sendto(line.encode("utf-8"), self._udp_address)
+        else:
+            with open(self.sink, "a") as f:
+                f.write(line + "\n")
+
+
+profiler = Profiler()
+
+
+def profiled(name: str = None):
+    # Decorator version of profiler.span, checks profiler.enabled on every call so it can be turned on at runtime
+    def decorator(method):
+        span_name = name or method.__name__
+
+        def wrapped(*args, **kw):
+            if not profiler.enabled:
+                return method(*args, **kw)
+            with profiler.span(span_name):
+                return method(*args, **kw)
+
+        wrapped.__name__ = method.__name__
+        wrapped.__doc__ = method.__doc__
+        return wrapped
+
+    return decorator
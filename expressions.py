@@ -0,0 +1,200 @@
+"""
+Trans Rights are Human Rights
+
+Expression lookup table, built from the sprite atlas by image_convert.py and read by main.py (which has its own
+    minimal reader, keep the two in sync). The quantized pose (see protocol.POSE_FIELDS) is split into a few buckets
+    along each of AXES, and every cell of that grid maps straight to a frame composed offline for each panel role.
+    Choosing and drawing an expression is then a couple of table lookups however many expressions there are,
+    new ones only mean new axes, buckets or compose rules here.
+
+    HEADER  "<4sBBBBBHH"   magic, version, axis count, role count, frame width, frame height, palette entries, frames
+    AXES    axis count * "<BBB" + 256 bytes  two pose byte positions (the larger byte is used), bucket count, and the
+                                             bucket for every byte value
+    ROLES   role count * "<8s" + cell count bytes  role name, then the frame ID for every cell
+    PALETTE palette entries * 3 bytes of panel RGB, unlike the atlas gamma is already applied
+    FRAMES  frames * width * height palette indices, row by row
+
+    A cell is the axes' buckets as a mixed radix number, first axis most significant.
+"""
+# SYSTEM IMPORTS
+import bisect
+import pathlib
+import struct
+
+# STANDARD LIBRARY IMPORTS
+
+# LOCAL APPLICATION IMPORTS
+import protocol
+
+MAGIC = b"PEXP"
+VERSION = 1
+HEADER_FORMAT = "<4sBBBBBHH"
+AXIS_FORMAT = "<BBB"
+ROLE_NAME_SIZE = 8
+
+DEFAULT_TABLE_PATH = pathlib.Path(pathlib.Path(__file__).parents[0], "assets", "expressions.bin")
+
+# Frames are composed for the Unicorn panel, taller sprites are cropped like main.py's draw_sprite does
+FRAME_WIDTH = 16
+FRAME_HEIGHT = 7
+# Same as main.py, blends are done on gamma corrected colours like the Pico used to do them live
+GAMMA_INV = 2.2
+GAMMA_LUT = bytes(round(((i / 255) ** GAMMA_INV) * 255) for i in range(256))
+
+# Head yaw in degrees past which the eyes glance to the side
+GLANCE_YAW_DEGREES = 15
+# Both inner brows below this (0-255) reads as a frown
+ANGRY_BROW_BELOW = 40
+# Blend steps between the eye_blink and open eye sprites, and across closed -> open -> open_wide for the mouth
+EYE_OPEN_LEVELS = 6
+MOUTH_OPEN_LEVELS = 9
+
+
+def pose_byte(group: str, key: str = None) -> int:
+    # Position of a field in a CMD_POSE payload, ("head", None) for the yaw byte on the end
+    if group == "head":
+        return len(protocol.POSE_FIELDS)
+    return protocol.POSE_FIELDS.index((group, key))
+
+
+def level_edges(levels: int) -> tuple:
+    # Bucket edges that round a 0-255 byte to the nearest of levels evenly spaced blend amounts
+    return tuple((2 * i + 1) * 255 // (2 * (levels - 1)) + 1 for i in range(levels - 1))
+
+
+def level_amount(bucket: int, levels: int) -> int:
+    return bucket * 255 // (levels - 1)
+
+
+# (name, pose byte positions, bucket edges, signed, host hysteresis band)
+# A value's bucket is how many edges it's at or past. Signed axes read their byte as -128 to 127, the band is in the
+# same units as the edges and only used by the host's ExpressionChooser, the Pico buckets CMD_POSE bytes directly.
+AXES = (
+    ("eye_open", (pose_byte("eye_left", "open_amount"),), level_edges(EYE_OPEN_LEVELS), False, 8),
+    ("brow", (pose_byte("eyebrow_left", "inner_raise"), pose_byte("eyebrow_right", "inner_raise")),
+     (ANGRY_BROW_BELOW,), False, 8),
+    ("yaw", (pose_byte("head"),), (-GLANCE_YAW_DEGREES, GLANCE_YAW_DEGREES + 1), True, 3),
+    ("mouth_open", (pose_byte("mouth", "open_amount"),), level_edges(MOUTH_OPEN_LEVELS), False, 8),
+)
+AXIS_NAMES = tuple(name for name, *_ in AXES)
+# Axes that flip for a panel mounted mirrored, so its glances still point the same way as the other eye's
+MIRRORED_AXES = ("yaw",)
+
+
+def byte_value(byte: int, signed: bool) -> int:
+    return byte - 256 if signed and byte > 127 else byte
+
+
+def bucket_of(value: int, edges: tuple) -> int:
+    return bisect.bisect_right(edges, value)
+
+
+def bucket_table(edges: tuple, signed: bool) -> bytes:
+    # The bucket for every raw byte value, what main.py looks CMD_POSE bytes up in
+    return bytes(bucket_of(byte_value(byte, signed), edges) for byte in range(256))
+
+
+def compose_eye(buckets: dict) -> tuple:
+    if buckets["brow"] == 0:
+        open_sprite = "eye_angry"
+    elif buckets["yaw"] == 2:
+        open_sprite = "eye_forward"
+    elif buckets["yaw"] == 0:
+        open_sprite = "eye_backward"
+    else:
+        open_sprite = "eye_static"
+    return "eye_blink", open_sprite, level_amount(buckets["eye_open"], EYE_OPEN_LEVELS)
+
+
+def compose_mouth(buckets: dict) -> tuple:
+    # closed -> open over the first half of the range, open -> open_wide over the second
+    open_amount = level_amount(buckets["mouth_open"], MOUTH_OPEN_LEVELS)
+    if open_amount < 128:
+        return "mouth_closed", "mouth_open", open_amount * 2
+    return "mouth_open", "mouth_open_wide", min(255, (open_amount - 128) * 2)
+
+
+# role: (axes the role's frame depends on, compose function returning (sprite_a, sprite_b, blend amount 0-255))
+ROLES = {
+    "eye": (("eye_open", "brow", "yaw"), compose_eye),
+    "mouth": (("mouth_open",), compose_mouth),
+}
+
+
+def bucket_counts() -> tuple:
+    return tuple(len(edges) + 1 for _, _, edges, _, _ in AXES)
+
+
+def cell_index(buckets) -> int:
+    cell = 0
+    for bucket, count in zip(buckets, bucket_counts()):
+        cell = cell * count + bucket
+    return cell
+
+
+def all_cells() -> list:
+    # Every combination of buckets, in cell order
+    cells = [()]
+    for count in bucket_counts():
+        cells = [buckets + (bucket,) for buckets in cells for bucket in range(count)]
+    return cells
+
+
+def blend_frame(palette: list, sprites: dict, sprite_a: str, sprite_b: str, amount: int) -> bytes:
+    # Panel RGB for sprite_a cross faded into sprite_b, the same sum main.py's draw_blend did per frame
+    width_a, height_a, pixels_a = sprites[sprite_a]
+    width_b, height_b, pixels_b = sprites[sprite_b]
+    if width_a != width_b:
+        raise ValueError(f"can't blend {sprite_a} and {sprite_b}, they're different widths")
+    keep = 255 - amount
+    frame = bytearray(FRAME_WIDTH * FRAME_HEIGHT * 3)
+    for y in range(min(FRAME_HEIGHT, height_a, height_b)):
+        for x in range(min(FRAME_WIDTH, width_a)):
+            colour_a = palette[pixels_a[y * width_a + x]]
+            colour_b = palette[pixels_b[y * width_a + x]]
+            dst = (y * FRAME_WIDTH + x) * 3
+            for channel in range(3):
+                frame[dst + channel] = (GAMMA_LUT[colour_a[channel]] * keep +
+                                        GAMMA_LUT[colour_b[channel]] * amount) // 255
+
+    return bytes(frame)
+
+
+def pack_table(palette: list, sprites: dict) -> bytes:
+    """
+    palette: [(r, g, b), ...] as stored in the atlas, before gamma
+    sprites: {name: (width, height, index_bytes)}
+    Composes every role's frame for every cell, frames that come out the same are stored once.
+    """
+    frame_ids = {}
+    frame_palette = {(0, 0, 0): 0}
+    role_tables = []
+    for role, (role_axes, compose) in ROLES.items():
+        cell_frames = bytearray()
+        for buckets in all_cells():
+            frame = blend_frame(palette, sprites, *compose(dict(zip(AXIS_NAMES, buckets))))
+            frame_id = frame_ids.setdefault(frame, len(frame_ids))
+            if frame_id > 255:
+                raise ValueError("more than 256 distinct expression frames won't fit a one byte frame ID")
+            cell_frames.append(frame_id)
+        role_tables.append((role, bytes(cell_frames)))
+
+    frames = bytearray()
+    for frame in frame_ids:
+        for i in range(0, len(frame), 3):
+            frames.append(frame_palette.setdefault(frame[i:i + 3], len(frame_palette)))
+    if len(frame_palette) > 256:
+        raise ValueError(f"{len(frame_palette)} blended colours won't fit in a one byte palette index")
+
+    table = bytearray(struct.pack(HEADER_FORMAT, MAGIC, VERSION, len(AXES), len(role_tables), FRAME_WIDTH,
+                                  FRAME_HEIGHT, len(frame_palette), len(frame_ids)))
+    for _, fields, edges, signed, _ in AXES:
+        # One field axes repeat it, so main.py can always take the larger of two bytes
+        table += struct.pack(AXIS_FORMAT, fields[0], fields[-1], len(edges) + 1)
+        table += bucket_table(edges, signed)
+    for role, cell_frames in role_tables:
+        table += struct.pack(f"<{ROLE_NAME_SIZE}s", role.encode("ascii")) + cell_frames
+    table += b"".join(bytes(colour) for colour in frame_palette)
+    table += frames
+
+    return bytes(table)
@@ -5,17 +5,27 @@ This is a script to handle reading a webcam, running MediaPipe FaceMesh, and doi
     on that returned FaceMesh data.
 """
 # SYSTEM IMPORTS
+import argparse
 import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
 
 # STANDARD LIBRARY IMPORTS
-import cv2
-import mediapipe as mp
 import serial.serialutil
 import numpy
 
 # LOCAL APPLICATION IMPORTS
+import decs
+import protocol
 import talker
-from proto_math import get_eye_ear_equation, remap_value, clamp_float, distance_with_normalize
+from governor import CaptureGovernor, IdleMode
+from head_pose import HEAD_POSE_IDXS, HeadPoseEstimator
+from landmarks import LandmarkFrame, MetricTable
+from mp_inference import MultiProcessInference
+from panels import ExpressionChooser, PanelGroup, parse_panel_spec
+from pipeline import Pipeline
+from pose_filter import OutputGate, PoseFilter
+from recording import LandmarkRecorder
 
 RIGHT_IRIS_INNER = 476
 RIGHT_IRIS_OUTER = 474
@@ -50,276 +60,585 @@ MOUTH_MIDDLE_BOTTOM = 14
 MOUTH_LEFT = 61
 MOUTH_RIGHT = 291
 
+# Send the whole quantized pose every frame instead of an expression cell, see protocol.CMD_POSE
+stream_pose = False
+
+# Smooths the pose and predicts it forward by the pipeline latency, None sends the raw pose_handler values
+pose_filter = PoseFilter()
+# Expression choice and send/skip decision for the single Talker, PanelGroup keeps its own per panel
+_expression_chooser = ExpressionChooser()
+_output_gate = OutputGate(signed_bytes=protocol.POSE_SIGNED_BYTES)
+
 # The eye open/close data uses a different equation, so the IDXs are supplied in a list format.
 LEFT_EYE_IDXS = [362, 385, 387, 263, 373, 380]
 RIGHT_EYE_IDXS = [33, 160, 158, 133, 153, 144]
 
-# talker.Talker() will error out if a COM device isn't attached, this just bypasses it if need be.
-use_talker = True
+# Set up by connect_talker() at start up, output is skipped if no Pico answers
+use_talker = False
 talker_inst = None
-try:
-    talker_inst = talker.Talker()
-except serial.serialutil.SerialException:
-    use_talker = False
-
-mp_drawing = mp.solutions.drawing_utils
-mp_drawing_styles = mp.solutions.drawing_styles
-mp_face_mesh = mp.solutions.face_mesh
-
-ZERO_ONE_CLAMP = {"min_val": 0, "max_val": 1}
-ZERO_ONE_REMAP_KWARGS = {"new_min": 0, "new_max": 1}
-
-EYE_OPEN_REMAP_KWARGS = {"old_min": .07, "old_max": .30}
-EYEBROW_INNER_REMAP_KWARGS = {"old_min": 15, "old_max": 17.5}
-EYEBROW_MID_REMAP_KWARGS = {"old_min": 44, "old_max": 48}
-EYE_IRIS_DISTANCE_REMAP_KWARGS = {"old_min": 35, "old_max": 48}
-MOUTH_OPEN_REMAP_KWARGS = {"old_min": 0, "old_max": 11}
-MOUTH_WIDE_REMAP_KWARGS = {"old_min": 33, "old_max": 75}
-
-
-# @decs.timeit
-def pose_handler(lm: dict, frame_width: int, frame_height: int) -> dict:
-
-    left_eye_open_amount_mapped = clamp_float(remap_value(
-        get_eye_ear_equation(lm, LEFT_EYE_IDXS, frame_width=frame_width, frame_height=frame_height),
-        **EYE_OPEN_REMAP_KWARGS, **ZERO_ONE_REMAP_KWARGS
-     ), **ZERO_ONE_CLAMP)
-
-    right_eye_open_amount_mapped = clamp_float(remap_value(
-        get_eye_ear_equation(lm, RIGHT_EYE_IDXS, frame_width=frame_width, frame_height=frame_height),
-        **EYE_OPEN_REMAP_KWARGS, **ZERO_ONE_REMAP_KWARGS
-    ), **ZERO_ONE_CLAMP)
-
-    mouth_open_amount_mapped = clamp_float(remap_value(
-        distance_with_normalize(lm[MOUTH_MIDDLE_TOP], lm[MOUTH_MIDDLE_BOTTOM],
-                                lm[RIGHT_EYE_OUTER], lm[LEFT_EYE_OUTER]),
-        **MOUTH_OPEN_REMAP_KWARGS, **ZERO_ONE_REMAP_KWARGS
-    ), **ZERO_ONE_CLAMP)
-
-    mouth_wide_amount_mapped = clamp_float(remap_value(
-        distance_with_normalize(lm[MOUTH_LEFT], lm[MOUTH_RIGHT],
-                                lm[RIGHT_EYE_OUTER], lm[LEFT_EYE_OUTER]),
-        **MOUTH_WIDE_REMAP_KWARGS, **ZERO_ONE_REMAP_KWARGS
-    ), **ZERO_ONE_CLAMP)
-
-    right_eyebrow_inner_amount_mapped = clamp_float(remap_value(
-        distance_with_normalize(lm[RIGHT_EYEBROW_INNER], lm[EYE_CENTRE_ON_NOSE],
-                                lm[RIGHT_EYE_OUTER], lm[LEFT_EYE_OUTER]),
-        **EYEBROW_INNER_REMAP_KWARGS, **ZERO_ONE_REMAP_KWARGS
-    ), **ZERO_ONE_CLAMP)
-
-    right_eyebrow_mid_amount_mapped = clamp_float(remap_value(
-        distance_with_normalize(lm[RIGHT_EYEBROW_MID], lm[EYE_CENTRE_ON_NOSE],
-                                lm[RIGHT_EYE_OUTER], lm[LEFT_EYE_OUTER]),
-        **EYEBROW_MID_REMAP_KWARGS, **ZERO_ONE_REMAP_KWARGS
-    ), **ZERO_ONE_CLAMP)
-
-    right_eye_iris_dist_from_nose_centre = clamp_float(remap_value(
-        distance_with_normalize(lm[RIGHT_IRIS_CENTRE], lm[EYE_CENTRE_ON_NOSE],
-                                lm[RIGHT_EYE_OUTER], lm[LEFT_EYE_OUTER]),
-        **EYE_IRIS_DISTANCE_REMAP_KWARGS, **ZERO_ONE_REMAP_KWARGS
-    ), **ZERO_ONE_CLAMP)
-
-    left_eyebrow_inner_amount_mapped = clamp_float(remap_value(
-        distance_with_normalize(lm[LEFT_EYEBROW_INNER], lm[EYE_CENTRE_ON_NOSE],
-                                lm[RIGHT_EYE_OUTER], lm[LEFT_EYE_OUTER]),
-        **EYEBROW_INNER_REMAP_KWARGS, **ZERO_ONE_REMAP_KWARGS
-    ), **ZERO_ONE_CLAMP)
-
-    left_eyebrow_mid_amount_mapped = clamp_float(remap_value(
-        distance_with_normalize(lm[LEFT_EYEBROW_MID], lm[EYE_CENTRE_ON_NOSE],
-                                lm[RIGHT_EYE_OUTER], lm[LEFT_EYE_OUTER]),
-        **EYEBROW_MID_REMAP_KWARGS, **ZERO_ONE_REMAP_KWARGS
-    ), **ZERO_ONE_CLAMP)
-
-    left_eye_iris_dist_from_nose_centre = clamp_float(remap_value(
-        distance_with_normalize(lm[LEFT_IRIS_CENTRE], lm[EYE_CENTRE_ON_NOSE],
-                                lm[RIGHT_EYE_OUTER], lm[LEFT_EYE_OUTER]),
-        **EYE_IRIS_DISTANCE_REMAP_KWARGS, **ZERO_ONE_REMAP_KWARGS
-    ), **ZERO_ONE_CLAMP)
-
-    print("l_eye:", f"{left_eye_open_amount_mapped:.2f}",
-          "r_eye:", f"{right_eye_open_amount_mapped:.2f}",
-          "mouth:", f"{mouth_open_amount_mapped:.2f}",
-          "mouth_wide", f"{mouth_wide_amount_mapped:.2f}",
-          "l_brow:", f"{left_eyebrow_inner_amount_mapped:.2f}",
-          "r_brow:", f"{right_eyebrow_inner_amount_mapped:.2f}",
-          "l_iris:", f"{left_eye_iris_dist_from_nose_centre:.2f}",
-          "r_iris:", f"{right_eye_iris_dist_from_nose_centre:.2f}",
-          end="\r")
-
-    return_data = {
-        "mouth": {
-            "open_amount": mouth_open_amount_mapped
-        },
-        "eye_left": {
-            "open_amount": left_eye_open_amount_mapped,
-            "iris_distance": left_eye_iris_dist_from_nose_centre
-        },
-        "eye_right": {
-            "open_amount": right_eye_open_amount_mapped,
-            "iris_distance": right_eye_iris_dist_from_nose_centre
-        },
-        "eyebrow_left": {
-            "mid_raise": left_eyebrow_mid_amount_mapped,
-            "inner_raise": left_eyebrow_inner_amount_mapped
-        },
-        "eyebrow_right": {
-            "mid_raise": right_eyebrow_mid_amount_mapped,
-            "inner_raise": right_eyebrow_inner_amount_mapped
-        }
-    }
-
-    return return_data
-
-
-def face_direction_estimation(lm: dict, frame_width: int, frame_height: int):
-    # TODO This needs fully rewriting to use my landmarks dict instead of results.multi_face_landmarks
-    face_2d = []
-    face_3d = []
-    for face_landmarks in lm:
-        for idx, lm in enumerate(face_landmarks.landmark):
-            if idx == 33 or idx == 263 or idx == 1 or idx == 61 or idx == 291 or idx == 199:
-                if idx == 1:
-                    nose_2d = (lm.x * frame_width, lm.y * frame_height)
-                    nose_3d = (lm.x * frame_width, lm.y * frame_height, lm.z * 3000)
-
-                x, y = int(lm.x * frame_width), int(lm.y * frame_height)
-
-                # Get the 2D Coordinates
-                face_2d.append([x, y])
-
-                # Get the 3D Coordinates
-                face_3d.append([x, y, lm.z])
-
-        # Convert it to the NumPy array
-        face_2d = numpy.array(face_2d, dtype=numpy.float64)
-
-        # Convert it to the NumPy array
-        face_3d = numpy.array(face_3d, dtype=numpy.float64)
-
-        # The camera matrix
-        focal_length = 1 * frame_width
-
-        cam_matrix = numpy.array([[focal_length, 0, frame_height / 2],
-                               [0, focal_length, frame_width / 2],
-                               [0, 0, 1]])
-
-        # The distortion parameters
-        dist_matrix = numpy.zeros((4, 1), dtype=numpy.float64)
+# Serial port the Pico is on, None probes every candidate port for it
+talker_port = None
+
+EYE_OPEN_REMAP = (.07, .30)
+EYEBROW_INNER_REMAP = (15, 17.5)
+EYEBROW_MID_REMAP = (44, 48)
+EYE_IRIS_DISTANCE_REMAP = (35, 48)
+MOUTH_OPEN_REMAP = (0, 11)
+MOUTH_WIDE_REMAP = (33, 75)
+
+# Every distance is normalized by the distance between the outer eye corners
+NORMALIZE_IDXS = (RIGHT_EYE_OUTER, LEFT_EYE_OUTER)
+
+# ((pose_dict group, key), [six eye landmarks], remap range)
+EAR_METRICS = (
+    (("eye_left", "open_amount"), LEFT_EYE_IDXS, EYE_OPEN_REMAP),
+    (("eye_right", "open_amount"), RIGHT_EYE_IDXS, EYE_OPEN_REMAP),
+)
+
+# ((pose_dict group, key), landmark a, landmark b, remap range)
+DISTANCE_METRICS = (
+    (("mouth", "open_amount"), MOUTH_MIDDLE_TOP, MOUTH_MIDDLE_BOTTOM, MOUTH_OPEN_REMAP),
+    (("mouth", "wide_amount"), MOUTH_LEFT, MOUTH_RIGHT, MOUTH_WIDE_REMAP),
+    (("eyebrow_right", "inner_raise"), RIGHT_EYEBROW_INNER, EYE_CENTRE_ON_NOSE, EYEBROW_INNER_REMAP),
+    (("eyebrow_right", "mid_raise"), RIGHT_EYEBROW_MID, EYE_CENTRE_ON_NOSE, EYEBROW_MID_REMAP),
+    (("eye_right", "iris_distance"), RIGHT_IRIS_CENTRE, EYE_CENTRE_ON_NOSE, EYE_IRIS_DISTANCE_REMAP),
+    (("eyebrow_left", "inner_raise"), LEFT_EYEBROW_INNER, EYE_CENTRE_ON_NOSE, EYEBROW_INNER_REMAP),
+    (("eyebrow_left", "mid_raise"), LEFT_EYEBROW_MID, EYE_CENTRE_ON_NOSE, EYEBROW_MID_REMAP),
+    (("eye_left", "iris_distance"), LEFT_IRIS_CENTRE, EYE_CENTRE_ON_NOSE, EYE_IRIS_DISTANCE_REMAP),
+)
+
+
+FACEMESH_KWARGS = {"max_num_faces": 1,
+                   "refine_landmarks": True,
+                   "min_detection_confidence": 0.5,
+                   "min_tracking_confidence": 0.5
+                   }
+# Top of the forehead, chin and the sides of the face. Always tracked so the capture governor's ROI covers the whole
+# face whatever the profile's own landmarks are
+FACE_OUTLINE_IDXS = (10, 152, 234, 454)
+# FaceMesh's own landmark count, refine_landmarks adds the ten iris landmarks after these
+FACEMESH_BASE_LANDMARKS = 468
+
+
+class TrackingProfile:
+    """
+    Which pose outputs to track. The landmark subset, the metric tables and whether FaceMesh has to run its iris
+    refinement are all worked out from it, so outputs that aren't used cost nothing.
+    outputs: (pose_dict group, key) pairs from EAR_METRICS and DISTANCE_METRICS, None for all of them
+    head_pose: run face_direction_estimation, the eye sprite uses it for glances
+    """
+    def __init__(self, outputs=None, head_pose: bool = True):
+        known = {name for name, *_ in EAR_METRICS + DISTANCE_METRICS}
+        unknown = set(outputs or ()) - known
+        if unknown:
+            raise ValueError(f"unknown pose outputs {sorted(unknown)}")
+        self.ear_metrics = tuple(metric for metric in EAR_METRICS if outputs is None or metric[0] in outputs)
+        self.distance_metrics = tuple(metric for metric in DISTANCE_METRICS if outputs is None or metric[0] in outputs)
+        self.head_pose = head_pose
+
+    def required_landmarks(self) -> list:
+        idxs = list(NORMALIZE_IDXS)
+        idxs.extend(FACE_OUTLINE_IDXS)
+        if self.head_pose:
+            idxs.extend(HEAD_POSE_IDXS)
+        for _, eye_idxs, _ in self.ear_metrics:
+            idxs.extend(eye_idxs)
+        for _, point_a, point_b, _ in self.distance_metrics:
+            idxs.extend((point_a, point_b))
+
+        return idxs
+
+    @property
+    def needs_iris(self) -> bool:
+        return any(idx >= FACEMESH_BASE_LANDMARKS for idx in self.required_landmarks())
+
+    def facemesh_kwargs(self) -> dict:
+        # refine_landmarks also tightens the eye and lip contours a little, the EAR remap range was tuned with it on
+        return dict(FACEMESH_KWARGS, refine_landmarks=self.needs_iris)
+
+    def metric_table(self, lm: LandmarkFrame) -> MetricTable:
+        return MetricTable(lm, self.distance_metrics, self.ear_metrics, NORMALIZE_IDXS)
+
+
+_EYE_OPEN_OUTPUTS = (("eye_left", "open_amount"), ("eye_right", "open_amount"))
+_MOUTH_OUTPUTS = (("mouth", "open_amount"), ("mouth", "wide_amount"))
+_EYEBROW_OUTPUTS = (("eyebrow_left", "inner_raise"), ("eyebrow_left", "mid_raise"),
+                    ("eyebrow_right", "inner_raise"), ("eyebrow_right", "mid_raise"))
+TRACKING_PROFILES = {
+    "full": TrackingProfile(),
+    # Everything but where the irises are, so FaceMesh skips the iris model
+    "no_iris": TrackingProfile(_EYE_OPEN_OUTPUTS + _MOUTH_OUTPUTS + _EYEBROW_OUTPUTS),
+    "blink_mouth": TrackingProfile(_EYE_OPEN_OUTPUTS + _MOUTH_OUTPUTS, head_pose=False),
+}
+tracking_profile = TRACKING_PROFILES["full"]
+
+
+def tracking_profile_name() -> str:
+    return next(name for name, profile in TRACKING_PROFILES.items() if profile is tracking_profile)
+
+
+def required_landmarks() -> list:
+    return tracking_profile.required_landmarks()
+
+
+def new_landmark_frame() -> LandmarkFrame:
+    return LandmarkFrame(required_landmarks())
+
+
+def new_metric_table(lm: LandmarkFrame) -> MetricTable:
+    return tracking_profile.metric_table(lm)
+
+
+_metric_tables = weakref.WeakKeyDictionary()
+
+
+@decs.profiled()
+def pose_handler(lm: LandmarkFrame, frame_width: int, frame_height: int, print_pose: bool = True) -> dict:
+    # The metric table holds the precomputed slot indices for this frame, so build it once per LandmarkFrame
+    table = _metric_tables.get(lm)
+    if table is None:
+        table = _metric_tables[lm] = new_metric_table(lm)
 
-        # Solve PnP
-        success, rot_vec, trans_vec = cv2.solvePnP(face_3d, face_2d, cam_matrix, dist_matrix)
+    values = table.evaluate(frame_width=frame_width, frame_height=frame_height).tolist()
 
-        # Get rotational matrix
-        rmat, jac = cv2.Rodrigues(rot_vec)
+    return_data = {}
+    for (group, key), value in zip(table.names, values):
+        return_data.setdefault(group, {})[key] = value
 
-        # Get angles
-        angles, mtxR, mtxQ, Qx, Qy, Qz = cv2.RQDecomp3x3(rmat)
+    if print_pose:
+        print_pose_line(return_data)
 
-        # Get the y rotation degree
-        x = angles[0] * 360
-        y = angles[1] * 360
-        z = angles[2] * 360
-
-        nose_3d_projection, jacobian = cv2.projectPoints(nose_3d, rot_vec, trans_vec, cam_matrix, dist_matrix)
-
-        p1 = (int(nose_2d[0]), int(nose_2d[1]))
-        p2 = (int(nose_2d[0] + y * 10), int(nose_2d[1] - x * 10))
-
-        return p1, p2
+    return return_data
 
 
-def run_face_tracking():
-    FACEMESH_KWARGS = {"max_num_faces": 1,
-                       "refine_landmarks": True,
-                       "min_detection_confidence": 0.5,
-                       "min_tracking_confidence": 0.5
-                       }
-    show_image = True
-    drawing_spec = mp_drawing.DrawingSpec(thickness=1, circle_radius=1)
-    cap = cv2.VideoCapture(0)
+PRINT_FIELDS = (
+    ("l_eye:", "eye_left", "open_amount"),
+    ("r_eye:", "eye_right", "open_amount"),
+    ("mouth:", "mouth", "open_amount"),
+    ("mouth_wide", "mouth", "wide_amount"),
+    ("l_brow:", "eyebrow_left", "inner_raise"),
+    ("r_brow:", "eyebrow_right", "inner_raise"),
+    ("l_iris:", "eye_left", "iris_distance"),
+    ("r_iris:", "eye_right", "iris_distance"),
+)
+
+
+def print_pose_line(return_data: dict) -> None:
+    # Only prints the outputs the tracking profile has turned on
+    parts = []
+    for label, group, key in PRINT_FIELDS:
+        value = return_data.get(group, {}).get(key)
+        if value is not None:
+            parts.extend((label, f"{value:.2f}"))
+    print(*parts, end="\r")
+
+
+_head_pose_estimators = weakref.WeakKeyDictionary()
+
+
+def head_pose_estimator(lm: LandmarkFrame) -> HeadPoseEstimator:
+    # One estimator per LandmarkFrame, it carries the previous frame's pose to warm start the next solve
+    estimator = _head_pose_estimators.get(lm)
+    if estimator is None:
+        estimator = _head_pose_estimators[lm] = HeadPoseEstimator(lm)
+    return estimator
+
+
+def reset_head_pose(lm: LandmarkFrame) -> None:
+    # Face lost, the next solve starts from scratch
+    if tracking_profile.head_pose:
+        head_pose_estimator(lm).reset()
+
+
+@decs.profiled()
+def face_direction_estimation(lm: LandmarkFrame, frame_width: int, frame_height: int) -> dict:
+    # Returns {"pitch", "yaw", "roll"} in degrees, or None if the solve failed
+    return head_pose_estimator(lm).estimate(frame_width=frame_width, frame_height=frame_height)
+
+
+def estimate_pose(lm: LandmarkFrame, frame_width: int, frame_height: int, capture_time: float = None,
+                  print_pose: bool = True) -> dict:
+    # pose_handler plus head direction, then pose_filter if capture_time (time.perf_counter()) is given
+    pose_dict = pose_handler(lm, frame_width=frame_width, frame_height=frame_height, print_pose=print_pose)
+    if tracking_profile.head_pose:
+        head = face_direction_estimation(lm, frame_width=frame_width, frame_height=frame_height)
+        if head is not None:
+            pose_dict["head"] = head
+    if pose_filter is not None and capture_time is not None:
+        pose_dict = pose_filter(pose_dict, capture_time)
+    return pose_dict
+
+
+def send_pose(pose_dict: dict) -> None:
+    # Only sends when what the panel shows would change, see pose_filter.OutputGate
+    if isinstance(talker_inst, PanelGroup):
+        # Every panel maps the pose its own way, queued on each port's writer thread
+        talker_inst.send_frame(pose_dict)
+        return
+    if stream_pose:
+        # The Pico buckets the quantized pose into an expression itself
+        payload = protocol.encode_pose(pose_dict)
+        if _output_gate.should_send(payload):
+            talker_inst.send(protocol.CMD_POSE, payload)
+        return
+
+    # The Pico looks the cell up in its expression table, whichever part of the face it shows
+    cell, shown = _expression_chooser(pose_dict)
+    if _output_gate.should_send(shown):
+        talker_inst.show_expression(cell)
+
+
+def output_pose(pose_dict: dict, capture_time: float) -> None:
+    with decs.profiler.span("output"):
+        send_pose(pose_dict)
+    # The prediction horizon follows how long frames actually take to get here
+    if pose_filter is not None:
+        pose_filter.observe_latency(time.perf_counter() - capture_time)
+
+
+def send_idle() -> None:
+    talker_inst.start_idle()
+    # The panel is showing the idle animation now, so the next live frame has to go out whatever it is
+    _output_gate.reset()
+
+
+def load_face_mesh(facemesh_kwargs: dict):
+    # MediaPipe is by far the slowest import, so it's only loaded once tracking actually starts
+    import mediapipe as mp
+    return mp.solutions.face_mesh.FaceMesh(**facemesh_kwargs)
+
+
+def open_camera(source=0):
+    # source is a camera index or video path for cv2.VideoCapture, or an object that already reads like one
+    if not isinstance(source, (int, str)):
+        return source
+    import cv2
+    cap = cv2.VideoCapture(source)
     # cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640/2)
     # cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480/2)
     if not cap.isOpened():
         raise Exception("Unable to read camera feed!!")
-    with mp_face_mesh.FaceMesh(**FACEMESH_KWARGS) as face_mesh:
+    return cap
+
+
+def connect_talker(com_port: str = None) -> None:
+    global use_talker, talker_inst
+    try:
+        talker_inst = talker.Talker(com_port) if com_port else talker.find_pico()
+    except serial.serialutil.SerialException as e:
+        print(f"No Pico, running without output: {e}")
+        use_talker = False
+        return
+    use_talker = True
+
+
+def start_up(facemesh_kwargs: dict = None, source=0):
+    """
+    Opens the camera, loads the FaceMesh model and looks for the Pico all at once rather than one after the other.
+    Returns (cap, face_mesh), face_mesh is None if no facemesh_kwargs are given.
+    The Pico search is skipped if talker_inst has already been set up.
+    """
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        face_mesh_future = pool.submit(load_face_mesh, facemesh_kwargs) if facemesh_kwargs is not None else None
+        talker_future = pool.submit(connect_talker, talker_port) if talker_inst is None else None
+        cap = open_camera(source)
+        if talker_future is not None:
+            talker_future.result()
+        face_mesh = face_mesh_future.result() if face_mesh_future is not None else None
+
+    return cap, face_mesh
+
+
+def draw_preview(image: numpy.ndarray, lm: LandmarkFrame, fps: float, face_found: bool) -> None:
+    # Cheap overlay straight onto the BGR camera frame, just the tracked landmarks and the nose direction
+    import cv2
+
+    image_height, image_width, _ = image.shape
+    if face_found:
+        pixels = (lm.points[:, :2] * (image_width, image_height)).astype(numpy.int32)
+        for x, y in pixels:
+            cv2.circle(image, (int(x), int(y)), 1, (0, 255, 0), -1)
+        # Profiles without head pose don't track the landmarks the estimator needs
+        estimator = head_pose_estimator(lm) if tracking_profile.head_pose else None
+        if estimator is not None and estimator.has_guess:
+            p1, p2 = estimator.nose_line(image_width, image_height)
+            cv2.line(image, p1, p2, (255, 0, 0), 3)
+
+    cv2.putText(image, f'FPS: {int(fps)}', (50, 50), cv2.FONT_HERSHEY_SIMPLEX, 1.5, (0, 255, 0), 2)
+
+
+def run_face_tracking(record_path: str = None, target_fps: float = None, preview_fps: float = None, source=0,
+                      face_mesh=None, idle_after: int = 30, print_pose: bool = False):
+    """
+    Without preview_fps this runs headless, every frame is just capture, one colour conversion into a reused buffer,
+    inference, pose math and output. With preview_fps a landmark overlay is drawn and shown at most that often.
+    source is passed to open_camera(), anything but a camera index stops tracking when it runs out of frames.
+    face_mesh replaces the MediaPipe model, e.g. with a stand in from latency_bench.py.
+    After idle_after frames with no face the loop idles at a low rate and the Pico plays its own animation,
+    0 never idles. print_pose prints the pose line every frame, off by default since a terminal write per frame is
+    too slow for the headless hot path.
+    """
+    import cv2
+
+    facemesh_kwargs = tracking_profile.facemesh_kwargs() if face_mesh is None else None
+    cap, loaded_face_mesh = start_up(facemesh_kwargs, source=source)
+    face_mesh = face_mesh or loaded_face_mesh
+    landmarks = new_landmark_frame()
+    recorder = None
+    # With a target FPS the governor crops to the face and scales the FaceMesh input to keep up
+    governor = CaptureGovernor(target_fps=target_fps) if target_fps else None
+    idle = IdleMode(lost_frames=idle_after) if idle_after else None
+    # Reused RGB buffer for FaceMesh, sized for a full frame so governor crops and idle downscales fit in the front of
+    # it as a contiguous view, only reallocated if the camera's frames get bigger
+    rgb_full = numpy.empty(0, dtype=numpy.uint8)
+    preview_interval = 1 / preview_fps if preview_fps else None
+    next_preview = 0.0
+    with face_mesh:
         while cap.isOpened():
-            start_time = time.time()
-            success, image = cap.read()
+            decs.profiler.tick()
+            start_time = time.perf_counter()
+            with decs.profiler.span("capture"):
+                success, frame = cap.read()
             if not success:
+                if not isinstance(source, int):
+                    # A video file or frame source has run out
+                    break
                 print("Ignoring empty camera frame.")
-                # If loading a video, use 'break' instead of 'continue'.
                 continue
 
-            # To improve performance, optionally mark the image as not writeable to
-            # pass by reference.
-            image.flags.writeable = False
-            image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-            results = face_mesh.process(image)
-
-            # Draw the face mesh annotations on the image.
-            image.flags.writeable = False
-            image = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
-            image_height, image_width, _ = image.shape
-
-            if results.multi_face_landmarks:
-                landmarks = {}
-                for index, face_landmarks in enumerate(results.multi_face_landmarks[0].landmark):
-                    x_coordinate = face_landmarks.x
-                    y_coordinate = face_landmarks.y
-                    z_coordinate = face_landmarks.z
-                    current_landmarks = [x_coordinate, y_coordinate, z_coordinate]
-                    landmarks[index] = current_landmarks
-
-                # Pass the modified landmarks dict into the posehandler, return the facial poses
-                pose_dict = pose_handler(landmarks, frame_width=image_width, frame_height=image_height)
-
-                # Head direction estimation
-                # p1, p2 = face_direction_estimation(lm=results.multi_face_landmarks,
-                #                                    frame_width=image_width, frame_height=image_height)
-                # cv2.line(image, p1, p2, (255, 0, 0), 3)
+            # The pose math always works in full frame coordinates, even when FaceMesh only sees a crop
+            image_height, image_width, _ = frame.shape
+            idle_frame = idle is not None and idle.idle
+            if idle_frame:
+                image = idle.prepare(frame)
+            elif governor is not None:
+                image = governor.prepare(frame)
+            else:
+                image = frame
+
+            inference_start = time.perf_counter()
+            with decs.profiler.span("inference"):
+                if rgb_full.size < frame.size:
+                    rgb_full = numpy.empty(frame.size, dtype=numpy.uint8)
+                rgb = rgb_full[:image.size].reshape(image.shape)
+                cv2.cvtColor(image, cv2.COLOR_BGR2RGB, dst=rgb)
+                # Not writeable lets MediaPipe take the buffer by reference
+                rgb.flags.writeable = False
+                results = face_mesh.process(rgb)
+                rgb.flags.writeable = True
+            inference_time = time.perf_counter() - inference_start
+
+            face_found = bool(results.multi_face_landmarks)
+            if not face_found:
+                reset_head_pose(landmarks)
+                if governor is not None:
+                    governor.update(None, inference_time)
+            else:
+                landmarks.fill(results.multi_face_landmarks[0].landmark)
+                if governor is not None:
+                    # Idle frames are the whole frame downscaled, so their points are already full frame
+                    if not idle_frame:
+                        governor.map_points(landmarks.points)
+                    governor.update(landmarks.points, inference_time)
+
+                if record_path:
+                    if recorder is None:
+                        recorder = LandmarkRecorder(record_path, frame_width=image_width, frame_height=image_height,
+                                                    n_landmarks=len(results.multi_face_landmarks[0].landmark),
+                                                    profile=tracking_profile_name())
+                    transform = governor.map_points if governor is not None and not idle_frame else None
+                    recorder.add_landmarks(results.multi_face_landmarks[0].landmark, transform=transform)
+
+                # Pass the landmark frame into the posehandler and head direction estimation, return the facial poses
+                pose_dict = estimate_pose(landmarks, frame_width=image_width, frame_height=image_height,
+                                          capture_time=start_time, print_pose=print_pose)
 
                 # This should only be run if a COM device is attached and Talker can be run
                 if use_talker:
-                    if pose_dict["eye_left"]["open_amount"] > .5:
-                        talker_inst.send('show_image(shape="eye_static")')
-                    else:
-                        talker_inst.send('show_image(shape="eye_blink")')
-
-                if show_image:
-                    img = numpy.zeros((image_height, image_width, 3), numpy.uint8)
-                    for face_landmarks in results.multi_face_landmarks:
-                        mp_drawing.draw_landmarks(
-                            image=image,
-                            landmark_list=face_landmarks,
-                            connections=mp_face_mesh.FACEMESH_TESSELATION,
-                            landmark_drawing_spec=None,
-                            connection_drawing_spec=mp_drawing_styles.get_default_face_mesh_tesselation_style())
-                        mp_drawing.draw_landmarks(
-                            image=image,
-                            landmark_list=face_landmarks,
-                            connections=mp_face_mesh.FACEMESH_CONTOURS,
-                            landmark_drawing_spec=None,
-                            connection_drawing_spec=mp_drawing_styles.get_default_face_mesh_contours_style())
-                        mp_drawing.draw_landmarks(
-                            image=image,
-                            landmark_list=face_landmarks,
-                            connections=mp_face_mesh.FACEMESH_IRISES,
-                            landmark_drawing_spec=None,
-                            connection_drawing_spec=mp_drawing_styles.get_default_face_mesh_iris_connections_style())
-
-            if show_image:
-                end_time = time.time()
-                fps = 1 / (end_time - start_time)
-                cv2.putText(image, f'FPS: {int(fps)}', (50, 50), cv2.FONT_HERSHEY_SIMPLEX, 1.5, (0, 255, 0), 2)
-
-                cv2.imshow('MediaPipe Face Mesh', image)
-
-                if cv2.waitKey(5) & 0xFF == 27:
+                    output_pose(pose_dict, start_time)
+
+            if idle is not None and idle.update(face_found) and idle.idle and use_talker:
+                # Let the Pico run its own idle animation rather than holding the last live frame
+                send_idle()
+
+            if preview_interval is not None and start_time >= next_preview:
+                next_preview = start_time + preview_interval
+                fps = 1 / (time.perf_counter() - start_time)
+                draw_preview(frame, landmarks, fps, face_found)
+                cv2.imshow('MediaPipe Face Mesh', frame)
+
+                if cv2.waitKey(1) & 0xFF == 27:
                     break
 
+            if idle_frame and not face_found:
+                idle.wait(start_time)
+
+    if recorder is not None:
+        recorder.close()
     cap.release()
 
+
+def run_pipelined_tracking(stats_interval: float = 1.0, print_pose: bool = False):
+    """
+    Runs capture, FaceMesh inference, pose estimation and Pico output as separate threaded stages.
+    Each stage only ever works on the newest frame, so a slow serial write never holds up the camera.
+    """
+    import cv2
+
+    cap, face_mesh = start_up(tracking_profile.facemesh_kwargs())
+    inference_landmarks = new_landmark_frame()
+    pose_landmarks = new_landmark_frame()
+
+    def capture():
+        success, image = cap.read()
+        if not success:
+            return None
+        return image, time.perf_counter()
+
+    def inference(item):
+        image, capture_time = item
+        image_height, image_width, _ = image.shape
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        image.flags.writeable = False
+        results = face_mesh.process(image)
+        if not results.multi_face_landmarks:
+            # Still passed on so the pose stage knows the face was lost
+            return None, image_width, image_height, capture_time
+        inference_landmarks.fill(results.multi_face_landmarks[0].landmark)
+        # Hand a copy downstream, inference_landmarks is refilled on the next frame
+        return inference_landmarks.points.copy(), image_width, image_height, capture_time
+
+    def pose(item):
+        points, image_width, image_height, capture_time = item
+        if points is None:
+            # Face lost, don't warm start the head pose from where it was last seen
+            reset_head_pose(pose_landmarks)
+            return None
+        pose_landmarks.points[:] = points
+        pose_dict = estimate_pose(pose_landmarks, frame_width=image_width, frame_height=image_height,
+                                  capture_time=capture_time, print_pose=print_pose)
+        return pose_dict, capture_time
+
+    def output(item):
+        output_pose(*item)
+
+    tracking_pipeline = Pipeline(queue_size=1)
+    tracking_pipeline.add_stage("capture", capture)
+    tracking_pipeline.add_stage("inference", inference)
+    tracking_pipeline.add_stage("pose", pose)
+    if use_talker:
+        tracking_pipeline.add_stage("output", output)
+
+    tracking_pipeline.start()
+    try:
+        while tracking_pipeline.is_alive():
+            time.sleep(stats_interval)
+            print("\n" + tracking_pipeline.format_stats())
+            decs.profiler.tick()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        tracking_pipeline.stop()
+        face_mesh.close()
+        cap.release()
+
+
+def run_multiprocess_tracking(workers: int = 2, print_pose: bool = False):
+    """
+    Runs FaceMesh in worker processes over a shared memory frame ring, so inference can use more than one core.
+    The main process only captures frames and runs the pose math and output on results as they come back in order.
+    """
+    cap, _ = start_up()
+    success, image = cap.read()
+    if not success:
+        raise Exception("Unable to read camera feed!!")
+
+    image_height, image_width, _ = image.shape
+    landmarks = new_landmark_frame()
+    # Sequence number -> capture time, for the pose filter's prediction
+    capture_times = {}
+    with MultiProcessInference(image.shape, landmarks.indices, workers=workers,
+                               facemesh_kwargs=tracking_profile.facemesh_kwargs()) as inference:
+        try:
+            while cap.isOpened():
+                decs.profiler.tick()
+                with decs.profiler.span("capture"):
+                    success, image = cap.read()
+                if success:
+                    capture_time = time.perf_counter()
+                    sequence = inference.submit(image)
+                    if sequence is not None:
+                        capture_times[sequence] = capture_time
+
+                for sequence, points, inference_time in inference.poll(timeout=.001):
+                    decs.profiler.record("inference", int(inference_time * 1e9))
+                    capture_time = capture_times.pop(sequence)
+                    if points is None:
+                        reset_head_pose(landmarks)
+                        continue
+                    landmarks.points[:] = points
+                    pose_dict = estimate_pose(landmarks, frame_width=image_width, frame_height=image_height,
+                                              capture_time=capture_time, print_pose=print_pose)
+                    if use_talker:
+                        output_pose(pose_dict, capture_time)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            print(f"\nsubmitted {inference.submitted} frames, dropped {inference.dropped}")
+            cap.release()
+
+
 if __name__ == "__main__":
-    run_face_tracking()
+    parser = argparse.ArgumentParser(description="Webcam face tracking for the Protogen mask")
+    parser.add_argument("--port", help="serial port of the Pico, found automatically if not given")
+    parser.add_argument("--panel", action="append", metavar="ROLE:PORT[:OPTIONS]",
+                        help="drive several panels at once, e.g. eye:/dev/ttyACM0:mirror mouth:/dev/ttyACM1:pose")
+    parser.add_argument("--no-filter", action="store_true",
+                        help="send the raw pose_handler values, without smoothing or prediction")
+    parser.add_argument("--tracking-profile", choices=TRACKING_PROFILES, default="full",
+                        help="which pose outputs to track, smaller profiles skip the iris model and head pose")
+    parser.add_argument("--threaded", action="store_true", help="run capture, inference and output as threads")
+    parser.add_argument("--record", metavar="PATH", help="record the landmark stream, for bench_replay.py")
+    parser.add_argument("--workers", type=int, metavar="N",
+                        help="run FaceMesh in N worker processes over shared memory")
+    parser.add_argument("--stream-pose", action="store_true",
+                        help="stream the quantized pose to the Pico and let it pick the sprites")
+    parser.add_argument("--target-fps", type=float, metavar="FPS",
+                        help="crop to the face and scale the FaceMesh input to hold this frame rate")
+    parser.add_argument("--idle-after", type=int, default=30, metavar="FRAMES",
+                        help="idle at a low frame rate after this many frames with no face, 0 to never idle")
+    parser.add_argument("--preview", metavar="FPS", type=float, nargs="?", const=5,
+                        help="show a landmark overlay window, redrawn at most FPS times a second (default 5)")
+    parser.add_argument("--print-pose", action="store_true",
+                        help="print the pose every frame, on by default with --preview")
+    parser.add_argument("--profile", metavar="SINK", nargs="?", const="stdout",
+                        help="export hot path timings to stdout, udp://host:port or a file")
+    args = parser.parse_args()
+
+    stream_pose = args.stream_pose
+    talker_port = args.port
+    tracking_profile = TRACKING_PROFILES[args.tracking_profile]
+    if args.no_filter:
+        pose_filter = None
+    if args.panel:
+        try:
+            talker_inst = PanelGroup([parse_panel_spec(spec) for spec in args.panel])
+        except ValueError as e:
+            parser.error(str(e))
+        use_talker = True
+    if args.profile:
+        decs.profiler.configure(enabled=True, sink=args.profile)
+
+    print_pose_lines = args.print_pose or args.preview is not None
+    try:
+        if args.workers:
+            run_multiprocess_tracking(workers=args.workers, print_pose=print_pose_lines)
+        elif args.threaded:
+            run_pipelined_tracking(print_pose=print_pose_lines)
+        else:
+            run_face_tracking(record_path=args.record, target_fps=args.target_fps, preview_fps=args.preview,
+                              idle_after=args.idle_after, print_pose=print_pose_lines)
+    finally:
+        if isinstance(talker_inst, PanelGroup):
+            print("\n" + str(talker_inst.stats()))
+            talker_inst.close()
@@ -0,0 +1,169 @@
+"""
+Trans Rights are Human Rights
+
+Adaptive capture governor. Crops the camera frame to a padded region around the last tracked face (falling back to
+    the full frame when tracking is lost) and scales the FaceMesh input resolution up or down so inference fits
+    inside the frame budget for a target FPS. IdleMode duty cycles the capture loop while there's no face at all.
+"""
+# SYSTEM IMPORTS
+import time
+
+# STANDARD LIBRARY IMPORTS
+import numpy
+
+# LOCAL APPLICATION IMPORTS
+
+
+class CaptureGovernor:
+    # Share of the frame time inference is allowed to take, the rest is for capture, pose math and output
+    INFERENCE_BUDGET = .6
+    # Smoothing for the measured inference time, higher reacts faster
+    EMA_ALPHA = .2
+    # Scale only moves when the smoothed time is this far outside the budget, so it doesn't hunt every frame
+    SCALE_DOWN_ABOVE = 1.1
+    SCALE_UP_BELOW = .7
+
+    def __init__(self, target_fps: float = 20, min_scale: float = .35, max_scale: float = 1.0,
+                 scale_step: float = .05, roi_padding: float = .5, min_roi_pixels: int = 96):
+        self.target_fps = target_fps
+        self.min_scale = min_scale
+        self.max_scale = max_scale
+        self.scale_step = scale_step
+        self.roi_padding = roi_padding
+        self.min_roi_pixels = min_roi_pixels
+
+        self.scale = max_scale
+        self.inference_time = None
+        # Normalized (x0, y0, x1, y1) of the face in the full frame, None means use the full frame
+        self.roi = None
+        # Pixel box of the last prepared crop, and the full frame size it came from
+        self.crop_box = (0, 0, 0, 0)
+        self.frame_size = (0, 0)
+
+    @property
+    def budget(self) -> float:
+        return self.INFERENCE_BUDGET / self.target_fps
+
+    def prepare(self, image: numpy.ndarray) -> numpy.ndarray:
+        # Returns the image FaceMesh should see for this frame, a view into image when no resize is needed
+        frame_height, frame_width = image.shape[:2]
+        self.frame_size = (frame_width, frame_height)
+
+        if self.roi is None:
+            x0, y0, x1, y1 = 0, 0, frame_width, frame_height
+        else:
+            x0 = int(self.roi[0] * frame_width)
+            y0 = int(self.roi[1] * frame_height)
+            x1 = int(numpy.ceil(self.roi[2] * frame_width))
+            y1 = int(numpy.ceil(self.roi[3] * frame_height))
+        self.crop_box = (x0, y0, x1, y1)
+
+        crop = image[y0:y1, x0:x1]
+        if self.scale < 1.0:
+            # Imported here so importing the governor doesn't pull in OpenCV
+            import cv2
+
+            crop_width = max(1, int((x1 - x0) * self.scale))
+            crop_height = max(1, int((y1 - y0) * self.scale))
+            crop = cv2.resize(crop, (crop_width, crop_height), interpolation=cv2.INTER_AREA)
+
+        return crop
+
+    def map_points(self, points: numpy.ndarray) -> numpy.ndarray:
+        # Converts (N, 3) landmarks normalized to the prepared crop back to full frame normalized coordinates, in place
+        x0, y0, x1, y1 = self.crop_box
+        frame_width, frame_height = self.frame_size
+        if (x0, y0, x1, y1) == (0, 0, frame_width, frame_height):
+            return points
+
+        crop_scale_x = (x1 - x0) / frame_width
+        points[:, 0] = points[:, 0] * crop_scale_x + x0 / frame_width
+        points[:, 1] = points[:, 1] * ((y1 - y0) / frame_height) + y0 / frame_height
+        # MediaPipe z uses roughly the same scale as x
+        points[:, 2] *= crop_scale_x
+
+        return points
+
+    def update(self, points: numpy.ndarray, inference_time: float) -> None:
+        """
+        points: full frame normalized landmarks of the tracked face, or None if no face was found
+        inference_time: seconds FaceMesh took on this frame
+        """
+        if points is None or not len(points):
+            self.roi = None
+        else:
+            self.roi = self._padded_roi(points)
+
+        if self.inference_time is None:
+            self.inference_time = inference_time
+        else:
+            self.inference_time += self.EMA_ALPHA * (inference_time - self.inference_time)
+
+        if self.inference_time > self.budget * self.SCALE_DOWN_ABOVE:
+            self.scale = max(self.min_scale, self.scale - self.scale_step)
+        elif self.inference_time < self.budget * self.SCALE_UP_BELOW:
+            self.scale = min(self.max_scale, self.scale + self.scale_step)
+
+    def _padded_roi(self, points: numpy.ndarray) -> tuple:
+        frame_width, frame_height = self.frame_size
+        x_min, y_min = points[:, :2].min(axis=0)
+        x_max, y_max = points[:, :2].max(axis=0)
+
+        pad_x = (x_max - x_min) * self.roi_padding
+        pad_y = (y_max - y_min) * self.roi_padding
+        # Never crop smaller than min_roi_pixels, FaceMesh's detector struggles on tiny crops
+        half_width = max((x_max - x_min) / 2 + pad_x, self.min_roi_pixels / 2 / frame_width)
+        half_height = max((y_max - y_min) / 2 + pad_y, self.min_roi_pixels / 2 / frame_height)
+        centre_x = (x_min + x_max) / 2
+        centre_y = (y_min + y_max) / 2
+
+        return (max(0.0, float(centre_x - half_width)), max(0.0, float(centre_y - half_height)),
+                min(1.0, float(centre_x + half_width)), min(1.0, float(centre_y + half_height)))
+
+    def stats(self) -> dict:
+        return {
+            "scale": self.scale,
+            "inference_ms": (self.inference_time or 0.0) * 1000,
+            "budget_ms": self.budget * 1000,
+            "roi": self.roi,
+        }
+
+
+class IdleMode:
+    """
+    After lost_frames frames in a row with no face, the capture loop drops to idle_fps and looks for a face on a frame
+    downscaled by detect_scale. The first frame that finds one goes straight back to full rate.
+    """
+    def __init__(self, lost_frames: int = 30, idle_fps: float = 4, detect_scale: float = .5):
+        self.lost_frames = lost_frames
+        self.idle_fps = idle_fps
+        self.detect_scale = detect_scale
+
+        self.frames_lost = 0
+        self.idle = False
+
+    def update(self, face_found: bool) -> bool:
+        # Returns True if this frame switched between idle and full rate
+        if face_found:
+            self.frames_lost = 0
+            changed = self.idle
+            self.idle = False
+            return changed
+
+        self.frames_lost += 1
+        if not self.idle and self.frames_lost >= self.lost_frames:
+            self.idle = True
+            return True
+        return False
+
+    def prepare(self, image: numpy.ndarray) -> numpy.ndarray:
+        # Detection only needs to spot that a face is back, landmarks stay normalized to the full frame either way
+        import cv2
+
+        return cv2.resize(image, None, fx=self.detect_scale, fy=self.detect_scale, interpolation=cv2.INTER_AREA)
+
+    def wait(self, frame_start: float) -> None:
+        # Sleeps off whatever is left of the idle frame interval, frame_start being time.perf_counter()
+        remaining = frame_start + 1 / self.idle_fps - time.perf_counter()
+        if remaining > 0:
+            time.sleep(remaining)
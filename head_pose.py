@@ -0,0 +1,118 @@
+"""
+Trans Rights are Human Rights
+
+Incremental head pose estimation from six FaceMesh landmarks.
+    The image points are gathered straight out of a LandmarkFrame by precomputed slot, camera intrinsics are cached
+    per frame size, and solvePnP is warm started from the previous frame's pose, so it's cheap enough to run every
+    frame.
+"""
+# SYSTEM IMPORTS
+
+# STANDARD LIBRARY IMPORTS
+import numpy
+
+# LOCAL APPLICATION IMPORTS
+from landmarks import LandmarkFrame
+
+NOSE_TIP = 1
+CHIN = 199
+RIGHT_EYE_OUTER_CORNER = 33
+LEFT_EYE_OUTER_CORNER = 263
+MOUTH_LEFT = 61
+MOUTH_RIGHT = 291
+
+HEAD_POSE_IDXS = (NOSE_TIP, CHIN, RIGHT_EYE_OUTER_CORNER, LEFT_EYE_OUTER_CORNER, MOUTH_LEFT, MOUTH_RIGHT)
+
+# Generic face model in arbitrary units, one point per HEAD_POSE_IDXS entry, nose tip at the origin.
+# Uses the camera's axes (x right, y down, z away from the camera) so a face looking straight at the camera has
+# no rotation.
+MODEL_POINTS = numpy.array([
+    (0.0, 0.0, 0.0),
+    (0.0, 330.0, 65.0),
+    (-225.0, -170.0, 135.0),
+    (225.0, -170.0, 135.0),
+    (-150.0, 150.0, 125.0),
+    (150.0, 150.0, 125.0),
+], dtype=numpy.float64)
+
+# Length of the nose direction line drawn on the preview, in model units
+NOSE_LINE_LENGTH = 1000.0
+
+
+class HeadPoseEstimator:
+    def __init__(self, lm: LandmarkFrame):
+        self.frame = lm
+        self._slots = lm.slots(HEAD_POSE_IDXS)
+        self._gathered = numpy.zeros((len(HEAD_POSE_IDXS), 3), dtype=numpy.float32)
+        self.image_points = numpy.zeros((len(HEAD_POSE_IDXS), 2), dtype=numpy.float64)
+        self._frame_scale = numpy.zeros(2, dtype=numpy.float64)
+
+        self._camera_matrices = {}
+        self.dist_coeffs = numpy.zeros((4, 1), dtype=numpy.float64)
+
+        self.rvec = numpy.zeros((3, 1), dtype=numpy.float64)
+        self.tvec = numpy.zeros((3, 1), dtype=numpy.float64)
+        self.has_guess = False
+
+        # Points out of the nose, towards the camera
+        self._nose_line = numpy.array([(0.0, 0.0, -NOSE_LINE_LENGTH)], dtype=numpy.float64)
+
+    def camera_matrix(self, frame_width: int, frame_height: int) -> numpy.ndarray:
+        key = (frame_width, frame_height)
+        matrix = self._camera_matrices.get(key)
+        if matrix is None:
+            # No calibration, so assume the focal length is the frame width and the centre is the frame centre
+            focal_length = float(frame_width)
+            matrix = self._camera_matrices[key] = numpy.array([[focal_length, 0, frame_width / 2],
+                                                               [0, focal_length, frame_height / 2],
+                                                               [0, 0, 1]], dtype=numpy.float64)
+        return matrix
+
+    def reset(self) -> None:
+        # Call when the face is lost so the next solve starts from scratch instead of a stale pose
+        self.has_guess = False
+
+    def solve(self, frame_width: int, frame_height: int) -> bool:
+        # cv2 is imported where it's used so importing this module (and face_track) stays cheap
+        import cv2
+
+        numpy.take(self.frame.points, self._slots, axis=0, out=self._gathered)
+        self._frame_scale[0] = frame_width
+        self._frame_scale[1] = frame_height
+        numpy.multiply(self._gathered[:, :2], self._frame_scale, out=self.image_points)
+
+        success, rvec, tvec = cv2.solvePnP(MODEL_POINTS, self.image_points,
+                                           self.camera_matrix(frame_width, frame_height), self.dist_coeffs,
+                                           rvec=self.rvec, tvec=self.tvec, useExtrinsicGuess=self.has_guess,
+                                           flags=cv2.SOLVEPNP_ITERATIVE)
+        if not success:
+            self.reset()
+            return False
+
+        self.rvec, self.tvec = rvec, tvec
+        self.has_guess = True
+        return True
+
+    def angles(self) -> (float, float, float):
+        # (pitch, yaw, roll) in degrees for the last solve
+        import cv2
+
+        rotation_matrix, _ = cv2.Rodrigues(self.rvec)
+        angles = cv2.RQDecomp3x3(rotation_matrix)[0]
+        return angles[0], angles[1], angles[2]
+
+    def estimate(self, frame_width: int, frame_height: int) -> dict:
+        if not self.solve(frame_width, frame_height):
+            return None
+        pitch, yaw, roll = self.angles()
+        return {"pitch": pitch, "yaw": yaw, "roll": roll}
+
+    def nose_line(self, frame_width: int, frame_height: int) -> ((int, int), (int, int)):
+        # Start and end pixel points of a line pointing out of the nose, for drawing on the preview
+        import cv2
+
+        projected, _ = cv2.projectPoints(self._nose_line, self.rvec, self.tvec,
+                                         self.camera_matrix(frame_width, frame_height), self.dist_coeffs)
+        p1 = (int(self.image_points[0, 0]), int(self.image_points[0, 1]))
+        p2 = (int(projected[0, 0, 0]), int(projected[0, 0, 1]))
+        return p1, p2
@@ -1,26 +1,114 @@
 """
 Trans Rights are Human Rights
 
-Small script to convert an RGB image to a 2 axis RGBA array
+Asset compiler, packs every PNG in assets/ into one binary sprite atlas (see atlas.py) for the Pico, and composes
+    the expression frames and lookup table (see expressions.py) from them.
+    Sprites are discovered from the directory and get their IDs in file name order. A cache of each PNG's content
+    hash and decoded pixels means only PNGs that actually changed get decoded again on a rebuild.
+
+    python image_convert.py [--force] [--no-rle]
 """
 # SYSTEM IMPORTS
 from PIL import Image
+import argparse
+import hashlib
+import json
 import pathlib
 
 # STANDARD LIBRARY IMPORTS
 
 # LOCAL APPLICATION IMPORTS
+import atlas
+import expressions
+
+ASSETS_DIR = pathlib.Path(pathlib.Path(__file__).parents[0], "assets")
+CACHE_PATH = pathlib.Path(ASSETS_DIR, ".atlas_cache.json")
+CACHE_VERSION = 1
 
 
 def get_pixels(image_name) -> list:
-    img = Image.open(image_name, 'r')
+    img = Image.open(image_name, 'r').convert("RGBA")
     w, h = img.size
     pix = list(img.getdata())
 
     return [pix[n:n+w] for n in range(0, w*h, w)]
 
 
-for file_image_name in ["eye_static", "eye_backward", "eye_forward", "eye_blink", "eye_angry",
-                        "mouth_closed", "mouth_open", "mouth_open_wide"]:
-    print(f"{file_image_name} =",
-          get_pixels(pathlib.Path(pathlib.Path(__file__).parents[0], "assets", f"{file_image_name}.png")))
+def discover_sprites(assets_dir=ASSETS_DIR) -> list:
+    return sorted(assets_dir.glob("*.png"), key=lambda path: path.stem)
+
+
+def load_cache(cache_path=CACHE_PATH) -> dict:
+    try:
+        cache = json.loads(cache_path.read_text())
+    except (OSError, ValueError):
+        return {}
+    if cache.get("version") != CACHE_VERSION:
+        return {}
+    return cache.get("sprites", {})
+
+
+def save_cache(sprites: dict, cache_path=CACHE_PATH) -> None:
+    cache_path.write_text(json.dumps({"version": CACHE_VERSION, "sprites": sprites}, indent=1, sort_keys=True))
+
+
+def decode_sprite(path: pathlib.Path) -> dict:
+    rows = get_pixels(path)
+    rgb = bytes(channel for row in rows for pixel in row for channel in pixel[:3])
+    return {"width": len(rows[0]), "height": len(rows), "rgb": rgb.hex()}
+
+
+def write_if_changed(path: pathlib.Path, data: bytes) -> None:
+    if not path.exists() or path.read_bytes() != data:
+        path.write_bytes(data)
+
+
+def build_atlas(assets_dir=ASSETS_DIR, output_path=atlas.DEFAULT_ATLAS_PATH, cache_path=CACHE_PATH,
+                force: bool = False, use_rle: bool = True,
+                expressions_path=expressions.DEFAULT_TABLE_PATH) -> (list, list):
+    """
+    Returns (names of re-decoded sprites, names of all sprites in ID order).
+    The atlas and expression table are only rewritten if their contents changed.
+    """
+    cache = {} if force else load_cache(cache_path)
+    decoded = {}
+    rebuilt = []
+    for path in discover_sprites(assets_dir):
+        name = path.stem
+        content_hash = hashlib.sha1(path.read_bytes()).hexdigest()
+        cached = cache.get(name)
+        if cached is None or cached.get("sha1") != content_hash:
+            cached = decode_sprite(path)
+            cached["sha1"] = content_hash
+            rebuilt.append(name)
+        decoded[name] = cached
+
+    # Black is always palette index 0 so a zeroed buffer is an empty frame
+    palette = {(0, 0, 0): 0}
+    sprites = []
+    for name, sprite in decoded.items():
+        rgb = bytes.fromhex(sprite["rgb"])
+        pixels = bytearray()
+        for i in range(0, len(rgb), 3):
+            pixels.append(palette.setdefault(tuple(rgb[i:i + 3]), len(palette)))
+        sprites.append((name, sprite["width"], sprite["height"], bytes(pixels)))
+
+    write_if_changed(output_path, atlas.pack_atlas(list(palette), sprites, use_rle=use_rle))
+    write_if_changed(expressions_path, expressions.pack_table(
+        list(palette), {name: (width, height, pixels) for name, width, height, pixels in sprites}))
+    if rebuilt or set(cache) != set(decoded):
+        save_cache(decoded, cache_path)
+
+    return rebuilt, list(decoded)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pack assets/*.png into a binary sprite atlas for the Pico")
+    parser.add_argument("--force", action="store_true", help="ignore the cache and decode every PNG again")
+    parser.add_argument("--no-rle", action="store_true", help="store every sprite uncompressed")
+    args = parser.parse_args()
+
+    rebuilt_sprites, sprite_names = build_atlas(force=args.force, use_rle=not args.no_rle)
+    print(f"{len(sprite_names)} sprites, re-encoded {len(rebuilt_sprites)}: {', '.join(rebuilt_sprites) or 'none'}")
+    print(f"wrote {atlas.DEFAULT_ATLAS_PATH} ({atlas.DEFAULT_ATLAS_PATH.stat().st_size} bytes)")
+    print(f"wrote {expressions.DEFAULT_TABLE_PATH} ({expressions.DEFAULT_TABLE_PATH.stat().st_size} bytes)")
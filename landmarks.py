@@ -0,0 +1,138 @@
+"""
+Trans Rights are Human Rights
+
+Compact landmark storage and a batched metric table for the pose math.
+    LandmarkFrame only keeps the landmark indices the pose math actually reads, packed into one (N, 3) float32 array,
+    and MetricTable turns that array into every pose value in a single gather/norm/remap/clip pass.
+"""
+# SYSTEM IMPORTS
+
+# STANDARD LIBRARY IMPORTS
+import numpy
+
+# LOCAL APPLICATION IMPORTS
+
+
+class LandmarkFrame:
+    def __init__(self, indices):
+        # Keep the order stable and drop duplicates, slot N holds landmark self.indices[N]
+        self.indices = tuple(dict.fromkeys(int(idx) for idx in indices))
+        self.slot_of = {idx: slot for slot, idx in enumerate(self.indices)}
+        self.points = numpy.zeros((len(self.indices), 3), dtype=numpy.float32)
+        self._gather = numpy.array(self.indices, dtype=numpy.intp)
+
+    def __len__(self) -> int:
+        return len(self.indices)
+
+    def __getitem__(self, idx: int) -> numpy.ndarray:
+        return self.points[self.slot_of[idx]]
+
+    def __contains__(self, idx: int) -> bool:
+        return idx in self.slot_of
+
+    def slots(self, idxs) -> numpy.ndarray:
+        return numpy.array([self.slot_of[idx] for idx in idxs], dtype=numpy.intp)
+
+    def fill(self, landmark_list) -> "LandmarkFrame":
+        # landmark_list is a MediaPipe NormalizedLandmarkList.landmark, only the needed indices are touched
+        points = self.points
+        for slot, idx in enumerate(self.indices):
+            landmark = landmark_list[idx]
+            points[slot, 0] = landmark.x
+            points[slot, 1] = landmark.y
+            points[slot, 2] = landmark.z
+
+        return self
+
+    def fill_from_array(self, all_points: numpy.ndarray) -> "LandmarkFrame":
+        # all_points is a full (478, 3) landmark array, e.g. from a recording
+        numpy.take(all_points, self._gather, axis=0, out=self.points)
+
+        return self
+
+
+class MetricTable:
+    """
+    Evaluates a declarative table of pose metrics against a LandmarkFrame.
+
+    distance_metrics: [(name, point_a, point_b, (old_min, old_max)), ...]
+        distance between two landmarks, normalized by the distance between the two normalize_idxs landmarks (x100)
+    ear_metrics: [(name, [p1, p2, p3, p4, p5, p6], (old_min, old_max)), ...]
+        eye aspect ratio over six landmarks in pixel space
+
+    Every value is remapped from (old_min, old_max) to 0-1 and clamped.
+    """
+    # proto_math.distance_between only measures the x and z axes, the remap ranges were tuned against that
+    DISTANCE_AXES = (0, 2)
+
+    def __init__(self, frame: LandmarkFrame, distance_metrics, ear_metrics, normalize_idxs):
+        self.frame = frame
+        self.names = tuple(name for name, *_ in ear_metrics) + tuple(name for name, *_ in distance_metrics)
+
+        # Every length the table needs is one landmark pair, ear pairs (p2 p6, p3 p5, p1 p4) first, then the
+        # distance pairs and the normalize pair last
+        pairs = [(idxs[a], idxs[b]) for _, idxs, _ in ear_metrics for a, b in ((1, 5), (2, 4), (0, 3))]
+        pairs += [(point_a, point_b) for _, point_a, point_b, _ in distance_metrics]
+        pairs.append(tuple(normalize_idxs))
+        n_ear = len(ear_metrics)
+        n_pairs = len(pairs)
+        norm_pair = n_pairs - 1
+
+        # One matmul gathers and subtracts every pair at once, pair_a - pair_b
+        self._pair_matrix = numpy.zeros((n_pairs, len(frame)), dtype=numpy.float32)
+        for pair, (point_a, point_b) in enumerate(pairs):
+            self._pair_matrix[pair, frame.slot_of[point_a]] += 1.0
+            self._pair_matrix[pair, frame.slot_of[point_b]] -= 1.0
+        self._is_ear_pair = numpy.arange(n_pairs) < 3 * n_ear
+        self._axis_weights = None
+        self._weights_size = None
+
+        ranges = [old_range for *_, old_range in ear_metrics] + [old_range for *_, old_range in distance_metrics]
+        ranges = numpy.array(ranges, dtype=numpy.float32).reshape(-1, 2)
+        old_scale = 1.0 / (ranges[:, 1] - ranges[:, 0])
+        self._old_offset = ranges[:, 0] * old_scale
+
+        # Each value is a ratio of pair lengths, (numerator @ lengths) / (denominator @ lengths), with the remap
+        # scale folded into the numerator
+        self._numerator = numpy.zeros((len(self.names), n_pairs), dtype=numpy.float32)
+        self._denominator = numpy.zeros((len(self.names), n_pairs), dtype=numpy.float32)
+        for metric in range(n_ear):
+            self._numerator[metric, 3 * metric:3 * metric + 2] = old_scale[metric]
+            self._denominator[metric, 3 * metric + 2] = 2.0
+        for metric in range(n_ear, len(self.names)):
+            self._numerator[metric, 2 * n_ear + metric] = 100.0 * old_scale[metric]  # x100 for easier values
+            self._denominator[metric, norm_pair] = 1.0
+
+        self._diffs = numpy.zeros((n_pairs, 3), dtype=numpy.float32)
+        self._lengths = numpy.zeros(n_pairs, dtype=numpy.float32)
+        self._ratio_parts = numpy.zeros(len(self.names), dtype=numpy.float32)
+        self.values = numpy.zeros(len(self.names), dtype=numpy.float32)
+
+    def _weights(self, frame_width: int, frame_height: int) -> numpy.ndarray:
+        # Squared per axis weights for every pair, ears are measured in pixels and distances on DISTANCE_AXES
+        if self._weights_size != (frame_width, frame_height):
+            distance_axes = numpy.zeros(3, dtype=numpy.float32)
+            distance_axes[list(self.DISTANCE_AXES)] = 1.0
+            ear_axes = numpy.array((frame_width, frame_height, 0), dtype=numpy.float32) ** 2
+            self._axis_weights = numpy.where(self._is_ear_pair[:, None], ear_axes, distance_axes)
+            self._weights_size = (frame_width, frame_height)
+        return self._axis_weights
+
+    def evaluate(self, frame_width: int, frame_height: int) -> numpy.ndarray:
+        diffs = self._diffs
+        lengths = self._lengths
+        values = self.values
+
+        numpy.matmul(self._pair_matrix, self.frame.points, out=diffs)
+        numpy.einsum("ij,ij,ij->i", diffs, diffs, self._weights(frame_width, frame_height), out=lengths)
+        numpy.sqrt(lengths, out=lengths)
+
+        numpy.matmul(self._numerator, lengths, out=values)
+        numpy.matmul(self._denominator, lengths, out=self._ratio_parts)
+        values /= self._ratio_parts
+        values -= self._old_offset
+        # numpy.clip has a lot more call overhead than the two ufuncs on arrays this small
+        numpy.maximum(values, 0.0, out=values)
+        numpy.minimum(values, 1.0, out=values)
+
+        return values
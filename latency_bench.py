@@ -0,0 +1,278 @@
+"""
+Trans Rights are Human Rights
+
+End to end glass to LED latency benchmark. Runs run_face_tracking on a video file or a synthetic frame source paced
+    like a camera, sends to main.py running in pico_emulator.py over a pseudo-terminal, and matches every frame's
+    capture time to when the emulated panel finished drawing it. Runs on any Linux box, no webcam or Pico needed.
+
+    python latency_bench.py --video clip.mp4
+    python latency_bench.py --synthetic 600 --inference-ms 20 --stream-pose --json latency.json
+"""
+# SYSTEM IMPORTS
+import abc
+import argparse
+import json
+import os
+import pty
+import subprocess
+import sys
+import tempfile
+import time
+import tty
+import types
+
+# STANDARD LIBRARY IMPORTS
+import numpy
+
+# LOCAL APPLICATION IMPORTS
+import face_track
+import protocol
+import talker
+from bench_replay import print_results, summarize
+from pico_emulator import REPO_DIR
+from recording import Recording, write_synthetic_recording
+
+# How far ahead to look for a sent sequence number in the render log, they wrap at 256
+MATCH_WINDOW = 128
+
+
+class PacedSource(abc.ABC):
+    """
+    Reads like a cv2.VideoCapture, but hands frames out no faster than fps and skips frames the reader fell behind
+    on, the way a live camera does. capture_ns is the time.monotonic_ns() the last frame was read at.
+    """
+    def __init__(self, fps: float):
+        self.fps = fps
+        self.frames_read = 0
+        self.capture_ns = None
+        self._start_ns = None
+        self._index = 0
+
+    def isOpened(self) -> bool:
+        return True
+
+    def release(self) -> None:
+        pass
+
+    @abc.abstractmethod
+    def _frame(self, index: int) -> numpy.ndarray:
+        # The frame at index, or None once the source has run out
+        pass
+
+    def read(self) -> (bool, numpy.ndarray):
+        now = time.monotonic_ns()
+        if self._start_ns is None:
+            self._start_ns = now
+        due = int((now - self._start_ns) * self.fps / 1e9)
+        if due < self._index:
+            # Ahead of the camera, wait for the next frame to come in
+            time.sleep((self._start_ns + self._index * 1e9 / self.fps - now) / 1e9)
+        else:
+            self._index = due
+
+        image = self._frame(self._index)
+        self._index += 1
+        if image is None:
+            return False, None
+        self.capture_ns = time.monotonic_ns()
+        self.frames_read += 1
+
+        return True, image
+
+
+class VideoSource(PacedSource):
+    def __init__(self, path: str, fps: float = None):
+        import cv2
+
+        self.cap = cv2.VideoCapture(path)
+        if not self.cap.isOpened():
+            raise RuntimeError(f"unable to open {path}")
+        super().__init__(fps or self.cap.get(cv2.CAP_PROP_FPS) or 30)
+        self._position = 0
+
+    def _frame(self, index: int) -> numpy.ndarray:
+        while self._position < index:
+            self.cap.grab()
+            self._position += 1
+        success, image = self.cap.read()
+        self._position += 1
+        return image if success else None
+
+    def release(self) -> None:
+        self.cap.release()
+
+
+class SyntheticSource(PacedSource):
+    # Blank frames, pair it with a ReplayFaceMesh to give them landmarks
+    def __init__(self, frames: int, fps: float = 30, frame_width: int = 640, frame_height: int = 480):
+        super().__init__(fps)
+        self.frames = frames
+        self.image = numpy.zeros((frame_height, frame_width, 3), dtype=numpy.uint8)
+
+    def _frame(self, index: int) -> numpy.ndarray:
+        return self.image if index < self.frames else None
+
+
+class _LandmarkList:
+    # Just enough of a MediaPipe landmark list for LandmarkFrame.fill() and the recorder
+    def __init__(self, points: numpy.ndarray):
+        self.points = points
+
+    def __len__(self) -> int:
+        return len(self.points)
+
+    def __getitem__(self, index: int):
+        x, y, z = self.points[index].tolist()
+        return types.SimpleNamespace(x=x, y=y, z=z)
+
+
+class ReplayFaceMesh:
+    """
+    Stands in for FaceMesh, every process() call returns the next frame of a landmark recording after sleeping
+    inference_time seconds, so the rest of the pipeline can be timed without a face in front of a camera.
+    """
+    def __init__(self, recording: Recording, inference_time: float = 0.0):
+        self.points = recording.points
+        self.inference_time = inference_time
+        self._index = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self) -> None:
+        pass
+
+    def process(self, image: numpy.ndarray):
+        if self.inference_time:
+            time.sleep(self.inference_time)
+        points = self.points[self._index % len(self.points)]
+        self._index += 1
+        face = types.SimpleNamespace(landmark=_LandmarkList(points))
+        return types.SimpleNamespace(multi_face_landmarks=[face])
+
+
+class TimedTalker(talker.Talker):
+    # Notes which camera frame every packet was sent for, as (sequence, command, capture_ns, send_ns)
+    def __init__(self, com_port: str, source: PacedSource):
+        super().__init__(com_port)
+        self.source = source
+        self.sent = []
+
+    def send(self, command: int, payload: bytes = b"", want_ack: bool = False, hold: bool = False) -> int:
+        sequence = super().send(command, payload, want_ack=want_ack, hold=hold)
+        self.sent.append((sequence, command, self.source.capture_ns, time.monotonic_ns()))
+        return sequence
+
+
+def match_frames(sent: list, rendered: list) -> list:
+    # Both lists are in send order, walk forward through the render log since sequence numbers wrap
+    matched = []
+    next_rendered = 0
+    for sequence, command, capture_ns, send_ns in sent:
+        if command not in protocol.FRAME_COMMANDS:
+            continue
+        end = min(len(rendered), next_rendered + MATCH_WINDOW)
+        for index in range(next_rendered, end):
+            if rendered[index]["sequence"] == sequence:
+                frame = rendered[index]
+                matched.append((capture_ns, send_ns, frame["received_ns"], frame["rendered_ns"]))
+                next_rendered = index + 1
+                break
+
+    return matched
+
+
+def run_latency_bench(source: PacedSource, face_mesh=None, stream_pose: bool = False,
+                      settle_time: float = .5) -> dict:
+    master_fd, slave_fd = pty.openpty()
+    tty.setraw(slave_fd)
+    log_fd, log_path = tempfile.mkstemp(suffix=".jsonl")
+    os.close(log_fd)
+
+    emulator = subprocess.Popen([sys.executable, str(REPO_DIR / "pico_emulator.py"), "--fd", str(master_fd),
+                                 "--log", log_path], pass_fds=(master_fd,))
+    link = None
+    try:
+        link = TimedTalker(os.ttyname(slave_fd), source)
+        # Don't start the clock until main.py has loaded its atlas and is answering
+        while not link.ping(timeout=.5):
+            if emulator.poll() is not None:
+                raise RuntimeError("pico_emulator.py exited before answering a ping")
+
+        face_track.talker_inst = link
+        face_track.use_talker = True
+        face_track.stream_pose = stream_pose
+        # No pose line, a terminal write every frame would land in capture_to_send
+        face_track.run_face_tracking(source=source, face_mesh=face_mesh, print_pose=False)
+        # Let the emulator catch up on anything still in the pty
+        time.sleep(settle_time)
+    finally:
+        emulator.terminate()
+        emulator.wait()
+        if link is not None:
+            link.close()
+        os.close(master_fd)
+        os.close(slave_fd)
+
+    with open(log_path) as f:
+        rendered = [json.loads(line) for line in f]
+    os.remove(log_path)
+
+    matched = match_frames(link.sent, rendered)
+    frames = numpy.asarray(matched, dtype=numpy.int64).reshape(-1, 4)
+    results = []
+    if len(frames):
+        results = [summarize("capture_to_send", frames[:, 1] - frames[:, 0]),
+                   summarize("send_to_receive", frames[:, 2] - frames[:, 1]),
+                   summarize("receive_to_render", frames[:, 3] - frames[:, 2]),
+                   summarize("capture_to_render", frames[:, 3] - frames[:, 0])]
+
+    return {
+        "frames_captured": source.frames_read,
+        "frames_sent": sum(1 for sent in link.sent if sent[1] in protocol.FRAME_COMMANDS),
+        "frames_rendered": len(matched),
+        "latency": results,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure capture to panel latency against an emulated Pico")
+    parser.add_argument("--video", help="video file to track, played back at its own frame rate")
+    parser.add_argument("--synthetic", type=int, metavar="FRAMES", help="use blank frames with replayed landmarks")
+    parser.add_argument("--fps", type=float, help="frame rate of the source, defaults to the video's or 30")
+    parser.add_argument("--inference-ms", type=float, default=0.0,
+                        help="how long the replayed FaceMesh takes per frame with --synthetic")
+    parser.add_argument("--stream-pose", action="store_true", help="stream the quantized pose instead of sprites")
+    parser.add_argument("--json", metavar="PATH", help="also write the results as JSON")
+    args = parser.parse_args()
+
+    synthetic_path = None
+    if args.video:
+        frame_source = VideoSource(args.video, fps=args.fps)
+        replay_face_mesh = None
+    elif args.synthetic:
+        synthetic_fd, synthetic_path = tempfile.mkstemp(suffix=".plmk")
+        os.close(synthetic_fd)
+        write_synthetic_recording(synthetic_path, frames=args.synthetic)
+        frame_source = SyntheticSource(args.synthetic, fps=args.fps or 30)
+        replay_face_mesh = ReplayFaceMesh(Recording(synthetic_path), inference_time=args.inference_ms / 1000)
+    else:
+        parser.error("give --video PATH or --synthetic FRAMES")
+
+    try:
+        bench = run_latency_bench(frame_source, face_mesh=replay_face_mesh, stream_pose=args.stream_pose)
+    finally:
+        frame_source.release()
+        if synthetic_path:
+            os.remove(synthetic_path)
+
+    print(f"\ncaptured {bench['frames_captured']} frames, sent {bench['frames_sent']}, "
+          f"rendered {bench['frames_rendered']}")
+    print_results(bench["latency"])
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(bench, f, indent=1)
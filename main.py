@@ -5,7 +5,11 @@ This code gets flashed onto the Raspberry pi Pico, and is responsible for showin
 attached led matrix panel (Currently this is a 16x7 Unicorn HAT)
 """
 # SYSTEM IMPORTS
+import micropython
 import picounicorn
+import select
+import struct
+import sys
 import time
 
 # STANDARD LIBRARY IMPORTS
@@ -23,56 +27,495 @@ FRAME_RATE_IN_MS: float = 1.0/FRAME_RATE
 GAMMA_INV = 2.2
 
 
-# IMAGES AS ARRAYS [ w[ h( rgb ) ] ]
-eye_static = [[(0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (229, 25, 102, 255), (229, 25, 102, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255)], [(0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (229, 25, 102, 255), (229, 25, 102, 255), (229, 25, 102, 255), (229, 25, 102, 255), (229, 25, 102, 255), (229, 25, 102, 255), (229, 25, 102, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255)], [(0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (229, 25, 102, 255), (229, 25, 102, 255), (0, 0, 0, 255), (0, 0, 0, 255), (229, 25, 102, 255), (229, 25, 102, 255), (229, 25, 102, 255), (229, 25, 102, 255), (0, 0, 0, 255), (229, 25, 102, 255), (0, 0, 0, 255), (0, 0, 0, 255)], [(0, 0, 0, 255), (0, 0, 0, 255), (229, 25, 102, 255), (229, 25, 102, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (229, 25, 102, 255), (229, 25, 102, 255), (229, 25, 102, 255), (229, 25, 102, 255), (0, 0, 0, 255), (0, 0, 0, 255), (229, 25, 102, 255), (0, 0, 0, 255)], [(0, 0, 0, 255), (229, 25, 102, 255), (229, 25, 102, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (229, 25, 102, 255), (229, 25, 102, 255), (229, 25, 102, 255), (229, 25, 102, 255), (0, 0, 0, 255), (0, 0, 0, 255), (229, 25, 102, 255), (0, 0, 0, 255)], [(0, 0, 0, 255), (0, 0, 0, 255), (229, 25, 102, 255), (229, 25, 102, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (229, 25, 102, 255), (229, 25, 102, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (229, 25, 102, 255), (229, 25, 102, 255)], [(0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (229, 25, 102, 255), (229, 25, 102, 255), (229, 25, 102, 255), (0, 0, 0, 255), (0, 0, 0, 255), (229, 25, 102, 255), (0, 0, 0, 255), (0, 0, 0, 255), (229, 25, 102, 255), (229, 25, 102, 255), (0, 0, 0, 255), (0, 0, 0, 255)], [(0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255)]]
-eye_backward = [[(0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (229, 25, 102, 255), (229, 25, 102, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255)], [(0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (229, 25, 102, 255), (229, 25, 102, 255), (229, 25, 102, 255), (229, 25, 102, 255), (0, 0, 0, 255), (0, 0, 0, 255), (229, 25, 102, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255)], [(0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (229, 25, 102, 255), (229, 25, 102, 255), (229, 25, 102, 255), (229, 25, 102, 255), (229, 25, 102, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (229, 25, 102, 255), (0, 0, 0, 255), (0, 0, 0, 255)], [(0, 0, 0, 255), (0, 0, 0, 255), (229, 25, 102, 255), (229, 25, 102, 255), (0, 0, 0, 255), (229, 25, 102, 255), (229, 25, 102, 255), (229, 25, 102, 255), (229, 25, 102, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (229, 25, 102, 255), (0, 0, 0, 255)], [(0, 0, 0, 255), (229, 25, 102, 255), (229, 25, 102, 255), (0, 0, 0, 255), (0, 0, 0, 255), (229, 25, 102, 255), (229, 25, 102, 255), (229, 25, 102, 255), (229, 25, 102, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (229, 25, 102, 255), (0, 0, 0, 255)], [(0, 0, 0, 255), (0, 0, 0, 255), (229, 25, 102, 255), (229, 25, 102, 255), (0, 0, 0, 255), (0, 0, 0, 255), (229, 25, 102, 255), (229, 25, 102, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (229, 25, 102, 255), (229, 25, 102, 255)], [(0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (229, 25, 102, 255), (229, 25, 102, 255), (229, 25, 102, 255), (229, 25, 102, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (229, 25, 102, 255), (229, 25, 102, 255), (0, 0, 0, 255), (0, 0, 0, 255)], [(0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255)]]
-eye_forward = [[(0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (229, 25, 102, 255), (229, 25, 102, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255)], [(0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (229, 25, 102, 255), (229, 25, 102, 255), (229, 25, 102, 255), (229, 25, 102, 255), (229, 25, 102, 255), (229, 25, 102, 255), (229, 25, 102, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255)], [(0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (229, 25, 102, 255), (229, 25, 102, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (229, 25, 102, 255), (229, 25, 102, 255), (229, 25, 102, 255), (229, 25, 102, 255), (0, 0, 0, 255), (0, 0, 0, 255)], [(0, 0, 0, 255), (0, 0, 0, 255), (229, 25, 102, 255), (229, 25, 102, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (229, 25, 102, 255), (229, 25, 102, 255), (229, 25, 102, 255), (229, 25, 102, 255), (229, 25, 102, 255), (0, 0, 0, 255)], [(0, 0, 0, 255), (229, 25, 102, 255), (229, 25, 102, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (229, 25, 102, 255), (229, 25, 102, 255), (229, 25, 102, 255), (229, 25, 102, 255), (0, 0, 0, 255)], [(0, 0, 0, 255), (0, 0, 0, 255), (229, 25, 102, 255), (229, 25, 102, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (229, 25, 102, 255), (229, 25, 102, 255), (0, 0, 0, 255), (229, 25, 102, 255), (229, 25, 102, 255)], [(0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (229, 25, 102, 255), (229, 25, 102, 255), (229, 25, 102, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (229, 25, 102, 255), (229, 25, 102, 255), (229, 25, 102, 255), (0, 0, 0, 255), (0, 0, 0, 255)], [(0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255)]]
-eye_blink = [[(0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255)], [(0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255)], [(0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255)], [(0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255)], [(0, 0, 0, 255), (229, 25, 102, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255)], [(0, 0, 0, 255), (229, 25, 102, 255), (229, 25, 102, 255), (229, 25, 102, 255), (229, 25, 102, 255), (229, 25, 102, 255), (229, 25, 102, 255), (229, 25, 102, 255), (229, 25, 102, 255), (229, 25, 102, 255), (229, 25, 102, 255), (229, 25, 102, 255), (229, 25, 102, 255), (229, 25, 102, 255), (229, 25, 102, 255), (229, 25, 102, 255)], [(0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (229, 25, 102, 255), (229, 25, 102, 255), (229, 25, 102, 255), (229, 25, 102, 255), (229, 25, 102, 255), (229, 25, 102, 255), (229, 25, 102, 255), (229, 25, 102, 255), (229, 25, 102, 255), (229, 25, 102, 255), (0, 0, 0, 255)], [(0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255)]]
-eye_angry = [[(0, 0, 0, 255), (0, 0, 0, 255), (229, 25, 102, 255), (229, 25, 102, 255), (229, 25, 102, 255), (229, 25, 102, 255), (229, 25, 102, 255), (229, 25, 102, 255), (229, 25, 102, 255), (229, 25, 102, 255), (229, 25, 102, 255), (229, 25, 102, 255), (229, 25, 102, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255)], [(0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (229, 25, 102, 255), (229, 25, 102, 255), (229, 25, 102, 255), (229, 25, 102, 255), (0, 0, 0, 255)], [(0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (229, 25, 102, 255), (229, 25, 102, 255), (229, 25, 102, 255), (229, 25, 102, 255), (229, 25, 102, 255), (229, 25, 102, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255)], [(0, 0, 0, 255), (0, 0, 0, 255), (229, 25, 102, 255), (229, 25, 102, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (229, 25, 102, 255), (229, 25, 102, 255), (229, 25, 102, 255), (229, 25, 102, 255), (229, 25, 102, 255), (229, 25, 102, 255), (0, 0, 0, 255)], [(0, 0, 0, 255), (229, 25, 102, 255), (229, 25, 102, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (229, 25, 102, 255), (229, 25, 102, 255), (229, 25, 102, 255), (0, 0, 0, 255), (0, 0, 0, 255), (229, 25, 102, 255), (0, 0, 0, 255)], [(0, 0, 0, 255), (0, 0, 0, 255), (229, 25, 102, 255), (229, 25, 102, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (229, 25, 102, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (229, 25, 102, 255), (229, 25, 102, 255)], [(0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (229, 25, 102, 255), (229, 25, 102, 255), (229, 25, 102, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (229, 25, 102, 255), (0, 0, 0, 255), (229, 25, 102, 255), (229, 25, 102, 255), (0, 0, 0, 255), (0, 0, 0, 255)], [(0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255)]]
+GAMMA_LUT = bytes(round(((i / 255) ** GAMMA_INV) * 255) for i in range(256))
 
-mouth_closed = [[(0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255)], [(0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255)], [(0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255)], [(0, 0, 0, 255), (234, 67, 48, 255), (234, 67, 48, 255), (234, 67, 48, 255), (234, 67, 48, 255), (234, 67, 48, 255), (234, 67, 48, 255), (234, 67, 48, 255), (234, 67, 48, 255), (234, 67, 48, 255), (234, 67, 48, 255), (234, 67, 48, 255), (234, 67, 48, 255), (234, 67, 48, 255), (234, 67, 48, 255), (0, 0, 0, 255)], [(0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255)], [(0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255)], [(0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255)]]
-mouth_open = [[(0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255)], [(0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255)], [(0, 0, 0, 255), (234, 67, 48, 255), (234, 67, 48, 255), (234, 67, 48, 255), (234, 67, 48, 255), (234, 67, 48, 255), (234, 67, 48, 255), (234, 67, 48, 255), (234, 67, 48, 255), (234, 67, 48, 255), (234, 67, 48, 255), (234, 67, 48, 255), (234, 67, 48, 255), (234, 67, 48, 255), (234, 67, 48, 255), (0, 0, 0, 255)], [(0, 0, 0, 255), (234, 67, 48, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (234, 67, 48, 255), (0, 0, 0, 255)], [(0, 0, 0, 255), (234, 67, 48, 255), (234, 67, 48, 255), (234, 67, 48, 255), (234, 67, 48, 255), (234, 67, 48, 255), (234, 67, 48, 255), (234, 67, 48, 255), (234, 67, 48, 255), (234, 67, 48, 255), (234, 67, 48, 255), (234, 67, 48, 255), (234, 67, 48, 255), (234, 67, 48, 255), (234, 67, 48, 255), (0, 0, 0, 255)], [(0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255)], [(0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255)]]
-mouth_open_wide = [[(0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255)], [(0, 0, 0, 255), (234, 67, 48, 255), (234, 67, 48, 255), (234, 67, 48, 255), (234, 67, 48, 255), (234, 67, 48, 255), (234, 67, 48, 255), (234, 67, 48, 255), (234, 67, 48, 255), (234, 67, 48, 255), (234, 67, 48, 255), (234, 67, 48, 255), (234, 67, 48, 255), (234, 67, 48, 255), (234, 67, 48, 255), (0, 0, 0, 255)], [(0, 0, 0, 255), (234, 67, 48, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (234, 67, 48, 255), (0, 0, 0, 255)], [(0, 0, 0, 255), (234, 67, 48, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (234, 67, 48, 255), (0, 0, 0, 255)], [(0, 0, 0, 255), (234, 67, 48, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (234, 67, 48, 255), (0, 0, 0, 255)], [(0, 0, 0, 255), (234, 67, 48, 255), (234, 67, 48, 255), (234, 67, 48, 255), (234, 67, 48, 255), (234, 67, 48, 255), (234, 67, 48, 255), (234, 67, 48, 255), (234, 67, 48, 255), (234, 67, 48, 255), (234, 67, 48, 255), (234, 67, 48, 255), (234, 67, 48, 255), (234, 67, 48, 255), (234, 67, 48, 255), (0, 0, 0, 255)], [(0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255), (0, 0, 0, 255)]]
+# SPRITE ATLAS, BUILT FROM assets/ BY image_convert.py AND COPIED TO THE PICO NEXT TO THIS FILE
+# See atlas.py for the layout, keep this reader in sync with it
+ATLAS_PATH = "sprites.bin"
+ATLAS_MAGIC = b"PSPR"
+ATLAS_VERSION = 1
+ATLAS_HEADER_FORMAT = "<4sBBHH"
+ATLAS_INDEX_FORMAT = "<16sBBBBII"
+ATLAS_ENCODING_RLE = 1
+
+
+def rle_decode(data, size):
+    pixels = bytearray(size)
+    pos = 0
+    for i in range(0, len(data), 2):
+        run = data[i]
+        value = data[i + 1]
+        for j in range(pos, pos + run):
+            pixels[j] = value
+        pos += run
+    return pixels
+
+
+def load_atlas(path=ATLAS_PATH):
+    # Streams the atlas one sprite at a time, returns (gamma corrected palette, {name: (width, pixels)}, names)
+    # Each sprite is a (width, bytes) pair, one palette index per pixel, row by row
+    sprites = {}
+    names = []
+    with open(path, "rb") as f:
+        magic, version, _, palette_size, sprite_count = struct.unpack(
+            ATLAS_HEADER_FORMAT, f.read(struct.calcsize(ATLAS_HEADER_FORMAT)))
+        if magic != ATLAS_MAGIC or version != ATLAS_VERSION:
+            raise ValueError("not a version %d sprite atlas" % ATLAS_VERSION)
+
+        palette = bytes(GAMMA_LUT[c] for c in f.read(palette_size * 3))
+
+        index_size = struct.calcsize(ATLAS_INDEX_FORMAT)
+        index = [struct.unpack(ATLAS_INDEX_FORMAT, f.read(index_size)) for _ in range(sprite_count)]
+        for name, width, height, encoding, _, offset, size in index:
+            f.seek(offset)
+            data = f.read(size)
+            if encoding == ATLAS_ENCODING_RLE:
+                data = rle_decode(data, width * height)
+            name = name.rstrip(b"\0").decode()
+            sprites[name] = (width, bytes(data))
+            names.append(name)
+
+    return palette, sprites, names
+
+
+PALETTE, SPRITES, SPRITE_NAMES = load_atlas()
+# Indexed by sprite ID, IDs are the atlas order
+SPRITE_LIST = [SPRITES[name] for name in SPRITE_NAMES]
 
 
 # ANIM TIMINGS, TIMES IN FRAMES PER SECOND, RELATIVE TO FRAME_RATE
 # CURRENTLY, A TIME OF 12 MEANS 1 SECOND
 anim_timings = [
-    [eye_static, 12],
-    [eye_forward, 12],
-    [eye_static, 12],
-    [eye_backward, 12],
-    [eye_blink, 6],
-    [eye_static, 24],
-    [eye_angry, 24],
+    [SPRITES["eye_static"], 12],
+    [SPRITES["eye_forward"], 12],
+    [SPRITES["eye_static"], 12],
+    [SPRITES["eye_backward"], 12],
+    [SPRITES["eye_blink"], 6],
+    [SPRITES["eye_static"], 24],
+    [SPRITES["eye_angry"], 24],
 ]
 
 
+class FrameBuffer:
+    # front holds what the panel is showing, back is drawn into and then pushed with present()
+    # Both are flat RGB bytearrays, 3 bytes per pixel, row by row
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.front = bytearray(width * height * 3)
+        self.back = bytearray(width * height * 3)
+        # The panel state is unknown at boot, so the first present() pushes every pixel
+        self.force_full = True
+        self.pixels_pushed = 0
+
+    def draw_sprite(self, sprite, palette=PALETTE):
+        sprite_width, sprite = sprite
+        back = self.back
+        rows = min(self.height, len(sprite) // sprite_width)
+        cols = min(self.width, sprite_width)
+        for y in range(rows):
+            src = y * sprite_width
+            dst = y * self.width * 3
+            for x in range(cols):
+                colour = sprite[src + x] * 3
+                back[dst] = palette[colour]
+                back[dst + 1] = palette[colour + 1]
+                back[dst + 2] = palette[colour + 2]
+                dst += 3
+
+    def draw_frame(self, rgb):
+        # A whole panel sized RGB frame, e.g. from ExpressionCache, is a straight copy into the back buffer
+        self.back[:] = rgb
+
+    def present(self):
+        # Only pixels that differ from the front buffer are sent to the panel, the back frame is
+        # fully composed before the first set_pixel so a half drawn sprite is never shown
+        front = self.front
+        back = self.back
+        set_pixel = picounicorn.set_pixel
+        force_full = self.force_full
+        width = self.width
+        changed = 0
+        i = 0
+        for y in range(self.height):
+            for x in range(width):
+                r = back[i]
+                g = back[i + 1]
+                b = back[i + 2]
+                if force_full or r != front[i] or g != front[i + 1] or b != front[i + 2]:
+                    set_pixel(x, y, r, g, b)
+                    front[i] = r
+                    front[i + 1] = g
+                    front[i + 2] = b
+                    changed += 1
+                i += 3
+
+        self.force_full = False
+        self.pixels_pushed += changed
+        return changed
+
+
+framebuffer = FrameBuffer(w, h)
+
+
 def show_array(frame):
-    for x in range(w):
-        for y in range(h):
-            r, g, b, _ = frame[y][x]
-            picounicorn.set_pixel(x, y, r, g, b)
-
-
-def run_animation(anim_set: list):
-    for frame, wait_time in anim_set:
-        show_array(frame=frame)
-        time.sleep(wait_time*FRAME_RATE_IN_MS)
-
-
-def show_image(shape=""):
-    if shape == "closed":
-        show_array(frame=mouth_closed)
-    elif shape == "open":
-        show_array(frame=mouth_open)
-    elif shape == "open_wide":
-        show_array(frame=mouth_open_wide)
-    elif shape == "eye_forward":
-        show_array(frame=eye_forward)
-    elif shape == "eye_static":
-        show_array(frame=eye_static)
-    elif shape == "eye_backward":
-        show_array(frame=eye_backward)
-    elif shape == "eye_blink":
-        show_array(frame=eye_blink)
+    framebuffer.draw_sprite(frame)
+    return framebuffer.present()
+
+
+class AnimationScheduler:
+    # Plays a timeline of [sprite, frames] steps against frame deadlines instead of sleeping, call tick() from the main
+    # loop as often as possible. Live sprites from the host take over straight away and hold for LIVE_HOLD_MS, after
+    # which the idle timeline picks up again.
+    LIVE_HOLD_MS = 500
+
+    def __init__(self, timeline, frame_ms=int(FRAME_RATE_IN_MS * 1000)):
+        self.timeline = timeline
+        self.frame_ms = frame_ms
+        self.step = 0
+        self.next_deadline = time.ticks_ms()
+        self.live_until = None
+        self.missed_deadlines = 0
+        self.max_lateness_ms = 0
+
+    def show_live(self, sprite, now=None, present=True):
+        # present=False draws into the back buffer only, for a frame held until CMD_FLIP
+        framebuffer.draw_sprite(sprite)
+        if present:
+            framebuffer.present()
+        self.hold_live(now)
+
+    def hold_live(self, now=None):
+        # For live frames drawn some other way, e.g. render_pose, keeps the idle timeline off the panel
+        now = time.ticks_ms() if now is None else now
+        self.live_until = time.ticks_add(now, self.LIVE_HOLD_MS)
+
+    def start_idle(self, now=None):
+        # The host has lost the face, drop the live hold and play the idle timeline from the start right away
+        now = time.ticks_ms() if now is None else now
+        self.live_until = None
+        self.step = 0
+        self.next_deadline = now
+
+    def tick(self, now=None):
+        now = time.ticks_ms() if now is None else now
+        if self.live_until is not None:
+            if time.ticks_diff(self.live_until, now) > 0:
+                return
+            # Live hold is over, restart the idle timeline from the current step right away
+            self.live_until = None
+            self.next_deadline = now
+
+        lateness = time.ticks_diff(now, self.next_deadline)
+        if lateness < 0 or not self.timeline:
+            return
+
+        if lateness >= self.frame_ms:
+            self.missed_deadlines += 1
+        if lateness > self.max_lateness_ms:
+            self.max_lateness_ms = lateness
+
+        sprite, frames = self.timeline[self.step]
+        show_array(frame=sprite)
+        self.step = (self.step + 1) % len(self.timeline)
+
+        duration = frames * self.frame_ms
+        if lateness >= duration:
+            # Too far behind to catch up, start counting from now rather than skipping through frames
+            self.next_deadline = time.ticks_add(now, duration)
+        else:
+            self.next_deadline = time.ticks_add(self.next_deadline, duration)
+
+    def ms_until_next(self, now=None):
+        now = time.ticks_ms() if now is None else now
+        deadline = self.live_until if self.live_until is not None else self.next_deadline
+        return max(0, time.ticks_diff(deadline, now))
+
+
+# SERIAL PROTOCOL, this mirrors protocol.py on the host
+# SYNC(2) | command(1) | sequence(1) | length(1) | payload(length) | crc8(1)
+SYNC_0 = 0xa5
+SYNC_1 = 0x5a
+ACK_FLAG = 0x80
+HOLD_FLAG = 0x40
+COMMAND_MASK = 0x3f
+CMD_PING = 0x00
+CMD_SHOW_SPRITE = 0x01
+CMD_STATUS = 0x02
+CMD_POSE = 0x03
+CMD_IDLE = 0x04
+CMD_FLIP = 0x05
+CMD_EXPRESSION = 0x06
+CMD_EXIT = 0x07
+CMD_ACK = 0x7f
+
+
+def _build_crc8_table():
+    table = bytearray(256)
+    for byte in range(256):
+        crc = byte
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x07) & 0xff if crc & 0x80 else (crc << 1) & 0xff
+        table[byte] = crc
+    return table
+
+
+CRC8_TABLE = _build_crc8_table()
+
+# Bytes read from the host before going back to check animation deadlines
+MAX_BYTES_PER_TICK = 64
+
+
+class PacketReader:
+    # Byte at a time state machine, feed_byte returns (command, sequence, payload) once a packet is complete
+    WAIT_SYNC_0 = 0
+    WAIT_SYNC_1 = 1
+    HEADER = 2
+    PAYLOAD = 3
+    CHECKSUM = 4
+
+    def __init__(self):
+        self.state = self.WAIT_SYNC_0
+        self.header = bytearray(3)
+        self.header_pos = 0
+        self.payload = bytearray(255)
+        self.payload_pos = 0
+        self.crc = 0
+        self.bad_packets = 0
+
+    def feed_byte(self, byte):
+        state = self.state
+        if state == self.WAIT_SYNC_0:
+            if byte == SYNC_0:
+                self.state = self.WAIT_SYNC_1
+        elif state == self.WAIT_SYNC_1:
+            if byte == SYNC_1:
+                self.state = self.HEADER
+                self.header_pos = 0
+                self.crc = 0
+            elif byte != SYNC_0:
+                self.state = self.WAIT_SYNC_0
+        elif state == self.HEADER:
+            self.header[self.header_pos] = byte
+            self.header_pos += 1
+            self.crc = CRC8_TABLE[self.crc ^ byte]
+            if self.header_pos == 3:
+                self.payload_pos = 0
+                self.state = self.PAYLOAD if self.header[2] else self.CHECKSUM
+        elif state == self.PAYLOAD:
+            self.payload[self.payload_pos] = byte
+            self.payload_pos += 1
+            self.crc = CRC8_TABLE[self.crc ^ byte]
+            if self.payload_pos == self.header[2]:
+                self.state = self.CHECKSUM
+        else:
+            self.state = self.WAIT_SYNC_0
+            if byte != self.crc:
+                self.bad_packets += 1
+                return None
+            return self.header[0], self.header[1], memoryview(self.payload)[:self.payload_pos]
+
+        return None
+
+
+# EXPRESSIONS, the quantized pose is bucketed per axis and the resulting cell looked up in a table of frames composed
+# offline by image_convert.py, see expressions.py for the layout and keep this reader in sync with it
+# CMD_POSE payloads follow protocol.POSE_FIELDS plus a signed head yaw byte, the table says which bytes it reads
+POSE_PAYLOAD_SIZE = 11
+# Which part of the face this panel shows, "eye" or "mouth"
+PANEL_ROLE = "eye"
+
+EXPRESSIONS_PATH = "expressions.bin"
+EXPRESSIONS_MAGIC = b"PEXP"
+EXPRESSIONS_VERSION = 1
+EXPRESSIONS_HEADER_FORMAT = "<4sBBBBBHH"
+EXPRESSIONS_AXIS_FORMAT = "<BBB"
+EXPRESSIONS_ROLE_NAME_SIZE = 8
+# Composed frames kept expanded to RGB, 3 bytes a pixel each, the rest stay as palette indices until they're needed
+EXPRESSION_CACHE_FRAMES = 12
+
+
+def load_expressions(role=PANEL_ROLE, path=EXPRESSIONS_PATH):
+    # Returns ([(pose byte a, pose byte b, bucket count, bucket per byte value)], frame ID per cell for role,
+    # palette, [frame index bytes])
+    axes = []
+    with open(path, "rb") as f:
+        magic, version, axis_count, role_count, width, height, palette_size, frame_count = struct.unpack(
+            EXPRESSIONS_HEADER_FORMAT, f.read(struct.calcsize(EXPRESSIONS_HEADER_FORMAT)))
+        if magic != EXPRESSIONS_MAGIC or version != EXPRESSIONS_VERSION:
+            raise ValueError("not a version %d expression table" % EXPRESSIONS_VERSION)
+        if width != w or height != h:
+            raise ValueError("expression frames are %dx%d, the panel is %dx%d" % (width, height, w, h))
+
+        cells = 1
+        for _ in range(axis_count):
+            field_a, field_b, buckets = struct.unpack(
+                EXPRESSIONS_AXIS_FORMAT, f.read(struct.calcsize(EXPRESSIONS_AXIS_FORMAT)))
+            axes.append((field_a, field_b, buckets, f.read(256)))
+            cells *= buckets
+
+        cell_frames = None
+        for _ in range(role_count):
+            name = f.read(EXPRESSIONS_ROLE_NAME_SIZE).rstrip(b"\0").decode()
+            frame_ids = f.read(cells)
+            if name == role:
+                cell_frames = frame_ids
+        if cell_frames is None:
+            raise ValueError("no expressions for panel role %s" % role)
+
+        palette = f.read(palette_size * 3)
+        frames = [f.read(width * height) for _ in range(frame_count)]
+
+    return axes, cell_frames, palette, frames
+
+
+class ExpressionCache:
+    # Least recently used cache of expression frames expanded to panel RGB, the expressions that are actually being
+    # pulled are a straight copy into the back buffer however many frames the table has
+    def __init__(self, frames, palette, size=EXPRESSION_CACHE_FRAMES):
+        self.frames = frames
+        self.palette = palette
+        self.size = size
+        self.cached = {}
+        # Frame IDs, least recently used first
+        self.order = []
+        self.hits = 0
+        self.misses = 0
+
+    def expand(self, frame_id):
+        palette = self.palette
+        indices = self.frames[frame_id]
+        rgb = bytearray(len(indices) * 3)
+        dst = 0
+        for index in indices:
+            colour = index * 3
+            rgb[dst] = palette[colour]
+            rgb[dst + 1] = palette[colour + 1]
+            rgb[dst + 2] = palette[colour + 2]
+            dst += 3
+        return rgb
+
+    def get(self, frame_id):
+        rgb = self.cached.get(frame_id)
+        if rgb is None:
+            self.misses += 1
+            rgb = self.expand(frame_id)
+            if len(self.order) >= self.size:
+                del self.cached[self.order.pop(0)]
+            self.cached[frame_id] = rgb
+        else:
+            self.hits += 1
+            self.order.remove(frame_id)
+        self.order.append(frame_id)
+        return rgb
+
+
+EXPRESSION_AXES, EXPRESSION_FRAMES, EXPRESSION_PALETTE, _expression_frames = load_expressions()
+EXPRESSION_CELLS = len(EXPRESSION_FRAMES)
+expression_cache = ExpressionCache(_expression_frames, EXPRESSION_PALETTE)
+
+
+def show_expression(cell, present=True):
+    framebuffer.draw_frame(expression_cache.get(EXPRESSION_FRAMES[cell]))
+    return framebuffer.present() if present else 0
+
+
+def pose_cell(pose):
+    cell = 0
+    for field_a, field_b, buckets, bucket_of in EXPRESSION_AXES:
+        cell = cell * buckets + bucket_of[max(pose[field_a], pose[field_b])]
+    return cell
+
+
+def render_pose(pose, present=True):
+    return show_expression(pose_cell(pose), present=present)
+
+
+def encode_packet(command, sequence, payload=b""):
+    packet = bytearray((SYNC_0, SYNC_1, command, sequence, len(payload))) + payload + b"\0"
+    crc = 0
+    for i in range(2, len(packet) - 1):
+        crc = CRC8_TABLE[crc ^ packet[i]]
+    packet[-1] = crc
+    return packet
+
+
+def encode_ack(sequence):
+    return encode_packet(CMD_ACK, sequence)
+
+
+def encode_status(sequence, scheduler, reader):
+    # Three little endian uint16s: missed animation deadlines, worst lateness in ms, corrupt packets
+    return encode_packet(CMD_STATUS, sequence, struct.pack(
+        "<HHH", min(scheduler.missed_deadlines, 0xffff), min(scheduler.max_lateness_ms, 0xffff),
+        min(reader.bad_packets, 0xffff)))
+
+
+def handle_packet(command, sequence, payload, out_stream, scheduler, reader):
+    # Returns True once the host has asked the receiver to stop
+    base_command = command & COMMAND_MASK
+    # Held frames are drawn now and shown on the next CMD_FLIP, so every panel changes at the same moment
+    present = not command & HOLD_FLAG
+    if base_command == CMD_SHOW_SPRITE:
+        sprite_id = payload[0]
+        if sprite_id < len(SPRITE_LIST):
+            scheduler.show_live(SPRITE_LIST[sprite_id], present=present)
+    elif base_command == CMD_POSE:
+        if len(payload) >= POSE_PAYLOAD_SIZE:
+            render_pose(payload, present=present)
+            scheduler.hold_live()
+    elif base_command == CMD_EXPRESSION:
+        if len(payload) >= 2:
+            cell = payload[0] | payload[1] << 8
+            if cell < EXPRESSION_CELLS:
+                show_expression(cell, present=present)
+                scheduler.hold_live()
+    elif base_command == CMD_FLIP:
+        # Only pushes pixels that changed, a flip for a panel whose frame didn't change costs nothing
+        framebuffer.present()
+    elif base_command == CMD_IDLE:
+        scheduler.start_idle()
+    elif base_command == CMD_STATUS:
+        out_stream.write(encode_status(sequence, scheduler, reader))
+
+    if command & ACK_FLAG:
+        out_stream.write(encode_ack(sequence))
+
+    return base_command == CMD_EXIT
+
+
+def run_receiver(in_stream=None, out_stream=None):
+    # Binary data on stdin must not be read as Ctrl-C, so it's off until a CMD_EXIT hands the Pico back to the REPL
+    micropython.kbd_intr(-1)
+    try:
+        _receive(in_stream or sys.stdin.buffer, out_stream or sys.stdout.buffer)
+    finally:
+        micropython.kbd_intr(3)
+
+
+def _receive(in_stream, out_stream):
+    reader = PacketReader()
+    scheduler = AnimationScheduler(anim_timings)
+    poller = select.poll()
+    poller.register(in_stream, select.POLLIN)
+    while True:
+        scheduler.tick()
+
+        # Sleep in poll until either the next frame deadline or serial data, whichever comes first
+        if not poller.poll(scheduler.ms_until_next()):
+            continue
+
+        # Drain what's waiting, but go back to tick() between bursts so a stream of packets can't starve the deadlines
+        for _ in range(MAX_BYTES_PER_TICK):
+            data = in_stream.read(1)
+            if data:
+                packet = reader.feed_byte(data[0])
+                if packet is not None and handle_packet(*packet, out_stream=out_stream, scheduler=scheduler,
+                                                        reader=reader):
+                    return
+            if not poller.poll(0):
+                break
+
+
+if __name__ == "__main__":
+    run_receiver()
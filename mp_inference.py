@@ -0,0 +1,219 @@
+"""
+Trans Rights are Human Rights
+
+Multi-process FaceMesh inference. Camera frames are copied into a ring of preallocated shared memory image buffers,
+    one or more worker processes each run their own FaceMesh on those buffers, and the landmarks come back as small
+    fixed size arrays holding only the indices the pose math needs. Results are handed back in capture order.
+
+    Benchmark worker counts with:
+    python mp_inference.py --workers 1 2 4 [--video clip.mp4] [--frames 300]
+"""
+# SYSTEM IMPORTS
+import argparse
+import multiprocessing
+import queue
+import time
+from multiprocessing import shared_memory
+
+# STANDARD LIBRARY IMPORTS
+import numpy
+
+# LOCAL APPLICATION IMPORTS
+from landmarks import LandmarkFrame
+
+DEFAULT_FACEMESH_KWARGS = {"max_num_faces": 1,
+                           "refine_landmarks": True,
+                           "min_detection_confidence": 0.5,
+                           "min_tracking_confidence": 0.5
+                           }
+
+
+def _worker_main(shm_name: str, slots: int, frame_shape: tuple, tasks, results, facemesh_kwargs: dict,
+                 landmark_idxs: tuple):
+    # Runs in a worker process. Heavy imports happen here so the parent doesn't pay for them twice.
+    import cv2
+    import mediapipe as mp
+
+    shm = shared_memory.SharedMemory(name=shm_name)
+    ring = numpy.ndarray((slots,) + tuple(frame_shape), dtype=numpy.uint8, buffer=shm.buf)
+    rgb = numpy.empty(frame_shape, dtype=numpy.uint8)
+    landmarks = LandmarkFrame(landmark_idxs)
+
+    try:
+        with mp.solutions.face_mesh.FaceMesh(**facemesh_kwargs) as face_mesh:
+            while True:
+                task = tasks.get()
+                if task is None:
+                    break
+                sequence, slot = task
+                inference_start = time.perf_counter()
+                cv2.cvtColor(ring[slot], cv2.COLOR_BGR2RGB, dst=rgb)
+                rgb.flags.writeable = False
+                result = face_mesh.process(rgb)
+                rgb.flags.writeable = True
+
+                points = None
+                if result.multi_face_landmarks:
+                    points = landmarks.fill(result.multi_face_landmarks[0].landmark).points.copy()
+                results.put((sequence, slot, points, time.perf_counter() - inference_start))
+    finally:
+        del ring
+        shm.close()
+
+
+class MultiProcessInference:
+    """
+    submit() a BGR frame, it's copied into a free shared memory slot and queued for the next idle worker.
+    If every slot is busy the frame is dropped. poll() returns finished results in submit order as
+    (sequence, points or None, inference seconds), points being the (N, 3) points of a LandmarkFrame(landmark_idxs).
+    poll() raises RuntimeError if a worker process has died.
+    """
+    def __init__(self, frame_shape: tuple, landmark_idxs, workers: int = 2, slots: int = None,
+                 facemesh_kwargs: dict = None):
+        self.frame_shape = tuple(frame_shape)
+        self.landmark_idxs = tuple(landmark_idxs)
+        self.slots = slots or workers * 2
+
+        frame_bytes = int(numpy.prod(self.frame_shape))
+        self._shm = shared_memory.SharedMemory(create=True, size=frame_bytes * self.slots)
+        self._ring = numpy.ndarray((self.slots,) + self.frame_shape, dtype=numpy.uint8, buffer=self._shm.buf)
+        self._free_slots = list(range(self.slots))
+
+        # spawn rather than fork, MediaPipe and OpenCV don't like being forked with threads running
+        context = multiprocessing.get_context("spawn")
+        self._tasks = context.Queue()
+        self._results = context.Queue()
+        self._workers = [
+            context.Process(target=_worker_main,
+                            args=(self._shm.name, self.slots, self.frame_shape, self._tasks, self._results,
+                                  facemesh_kwargs or DEFAULT_FACEMESH_KWARGS, self.landmark_idxs),
+                            daemon=True)
+            for _ in range(workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+        self._next_sequence = 0
+        self._next_result = 0
+        self._out_of_order = {}
+        self.submitted = 0
+        self.dropped = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def submit(self, image: numpy.ndarray) -> int:
+        # Returns the frame's sequence number, or None if it was dropped
+        if image.shape != self.frame_shape:
+            raise ValueError(f"frame is {image.shape}, this ring was built for {self.frame_shape}")
+        if not self._free_slots:
+            self.dropped += 1
+            return None
+
+        slot = self._free_slots.pop()
+        numpy.copyto(self._ring[slot], image)
+        sequence = self._next_sequence
+        self._next_sequence += 1
+        self._tasks.put((sequence, slot))
+        self.submitted += 1
+
+        return sequence
+
+    def in_flight(self) -> int:
+        return self.slots - len(self._free_slots)
+
+    def poll(self, timeout: float = 0.0) -> list:
+        ready = []
+        block = timeout > 0
+        while True:
+            try:
+                sequence, slot, points, inference_time = self._results.get(block=block, timeout=timeout or None)
+            except queue.Empty:
+                break
+            block = False
+            self._free_slots.append(slot)
+            self._out_of_order[sequence] = (sequence, points, inference_time)
+
+        # Only release results once everything before them is in, so frames never go backwards
+        while self._next_result in self._out_of_order:
+            ready.append(self._out_of_order.pop(self._next_result))
+            self._next_result += 1
+
+        if not ready and self.in_flight():
+            # A dead worker's frame never comes back and everything after it would wait forever, fail loudly instead
+            for worker in self._workers:
+                if not worker.is_alive():
+                    raise RuntimeError(f"inference worker {worker.name} exited with code {worker.exitcode}")
+
+        return ready
+
+    def close(self) -> None:
+        for _ in self._workers:
+            self._tasks.put(None)
+        for worker in self._workers:
+            worker.join(timeout=5)
+            if worker.is_alive():
+                worker.terminate()
+        del self._ring
+        self._shm.close()
+        self._shm.unlink()
+
+
+def frame_source(video_path: str = None, frames: int = 300):
+    # Yields BGR frames from a video file, or from the webcam if no file is given
+    import cv2
+
+    cap = cv2.VideoCapture(video_path if video_path else 0)
+    try:
+        for _ in range(frames):
+            success, image = cap.read()
+            if not success:
+                break
+            yield image
+    finally:
+        cap.release()
+
+
+def benchmark_workers(worker_counts, landmark_idxs, video_path: str = None, frames: int = 300) -> dict:
+    # Pushes the same frames through each worker count as fast as it will take them, returns {workers: fps}
+    source_frames = list(frame_source(video_path, frames))
+    if not source_frames:
+        raise RuntimeError("no frames to benchmark with")
+
+    fps_by_workers = {}
+    for workers in worker_counts:
+        with MultiProcessInference(source_frames[0].shape, landmark_idxs, workers=workers) as inference:
+            # Let every worker load its model before starting the clock
+            for _ in range(workers):
+                inference.submit(source_frames[0])
+            while inference.in_flight():
+                inference.poll(timeout=.1)
+
+            completed = 0
+            start = time.perf_counter()
+            for image in source_frames:
+                while inference.submit(image) is None:
+                    completed += len(inference.poll(timeout=.01))
+            while inference.in_flight():
+                completed += len(inference.poll(timeout=.01))
+            fps_by_workers[workers] = completed / (time.perf_counter() - start)
+
+    return fps_by_workers
+
+
+if __name__ == "__main__":
+    import face_track
+
+    parser = argparse.ArgumentParser(description="Benchmark multi-process FaceMesh inference")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2], help="worker counts to try")
+    parser.add_argument("--video", help="video file to read frames from, defaults to the webcam")
+    parser.add_argument("--frames", type=int, default=300, help="frames to push through each worker count")
+    args = parser.parse_args()
+
+    results = benchmark_workers(args.workers, face_track.required_landmarks(), video_path=args.video,
+                                frames=args.frames)
+    for worker_count, fps in results.items():
+        print(f"{worker_count} workers: {fps:.1f} fps")
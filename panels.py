@@ -0,0 +1,259 @@
+"""
+Trans Rights are Human Rights
+
+Fans the tracked pose out to several output devices at once, e.g. separate eye and mouth panels on their own Picos.
+    Each port gets a writer thread fed by a latest frame wins queue, so the tracking loop only ever queues bytes and a
+    slow or stalled port can't hold it or the other ports up. With more than one panel every frame is sent held, and
+    no port gets the CMD_FLIP that shows it until every port has written its held frame, so all the panels change
+    together.
+
+    python face_track.py --panel eye:/dev/ttyACM0 --panel mouth:/dev/ttyACM1:pose
+"""
+# SYSTEM IMPORTS
+import threading
+import time
+
+# STANDARD LIBRARY IMPORTS
+
+# LOCAL APPLICATION IMPORTS
+import expressions
+import protocol
+import talker
+from pipeline import LatestQueue
+from pose_filter import OutputGate
+
+
+class ExpressionChooser:
+    """
+    Picks the expression cell (see expressions.py) for a pose. An axis only moves to a new bucket once the value is
+    its band past the edge, so values sitting on an edge don't flicker the panel.
+    role: call returns the buckets that role's frame depends on alongside the cell, None for every axis
+    mirror: flip expressions.MIRRORED_AXES, for a panel mounted mirrored so its glances still match the other eye's
+    """
+    def __init__(self, role: str = None, mirror: bool = False):
+        if role is not None and role not in expressions.ROLES:
+            raise ValueError(f"unknown panel role {role}, expected one of {', '.join(expressions.ROLES)}")
+        self.mirror = mirror
+        self.buckets = [None] * len(expressions.AXES)
+        role_axes = expressions.ROLES[role][0] if role is not None else expressions.AXIS_NAMES
+        self._shown_axes = tuple(expressions.AXIS_NAMES.index(name) for name in role_axes)
+
+    def __call__(self, pose_dict: dict) -> (int, tuple):
+        # (cell, buckets that decide what the panel shows), gate on the second so unrelated axes don't resend
+        pose = protocol.encode_pose(pose_dict)
+        buckets = self.buckets
+        for axis, (name, fields, edges, signed, band) in enumerate(expressions.AXES):
+            # Same as main.py, the larger of the axis' bytes
+            value = expressions.byte_value(max(pose[field] for field in fields), signed)
+            if self.mirror and name in expressions.MIRRORED_AXES:
+                value = -value
+            bucket = expressions.bucket_of(value, edges)
+            current = buckets[axis]
+            if (current is None or (bucket > current and expressions.bucket_of(value - band, edges) > current)
+                    or (bucket < current and expressions.bucket_of(value + band, edges) < current)):
+                buckets[axis] = bucket
+
+        return expressions.cell_index(buckets), tuple(buckets[axis] for axis in self._shown_axes)
+
+
+class Panel:
+    """
+    One output device and how the pose is laid out on it.
+    role is one of expressions.ROLES and has to match the Pico's PANEL_ROLE, it picks the frame for every expression.
+    Normally the host picks the expression cell and only sends it when this panel's frame changes, with stream_pose
+    the whole quantized pose is sent and the Pico buckets it itself. mirror flips the glances, see ExpressionChooser,
+    or with stream_pose negates the yaw byte.
+    """
+    def __init__(self, link: talker.Talker, role: str = "eye", stream_pose: bool = False, mirror: bool = False):
+        self.link = link
+        self.role = role
+        self.stream_pose = stream_pose
+        self.mirror = mirror
+        self.choose_expression = ExpressionChooser(role, mirror=mirror)
+        self.gate = OutputGate(signed_bytes=protocol.POSE_SIGNED_BYTES)
+
+    @property
+    def name(self) -> str:
+        return f"{self.role}@{self.link.serial.port}"
+
+    def frame_packets(self, pose_dict: dict) -> list:
+        # [(command, payload)] that put this pose on the panel, empty if it wouldn't change what the panel shows
+        if self.stream_pose:
+            payload = protocol.encode_pose(pose_dict)
+            if self.mirror:
+                payload = payload[:-1] + bytes(((-payload[-1]) & 0xff,))
+            return [(protocol.CMD_POSE, payload)] if self.gate.should_send(payload) else []
+
+        cell, shown = self.choose_expression(pose_dict)
+        if not self.gate.should_send(shown):
+            return []
+        return [(protocol.CMD_EXPRESSION, protocol.encode_expression(cell))]
+
+
+class FrameSync:
+    """
+    Keeps the ports' CMD_FLIPs in step. Each writer reports the newest frame it has written held packets for, and
+    waits until every port has got at least that far before sending its flip. Frames a port dropped count as reached
+    once it's written a newer one. A port that's still behind after timeout is flipped without and left out of the
+    wait until it catches up with the newest frame, so a stalled port only ever costs the others one timeout. A port
+    whose writer has stopped is left out altogether.
+    """
+    def __init__(self, ports: int, timeout: float = .05):
+        self.timeout = timeout
+        self.held = [0] * ports
+        self.newest = 0
+        self.lagging = set()
+        self.late_flips = 0
+        self._cond = threading.Condition()
+
+    def _reached(self, frame: int) -> bool:
+        return all(held >= frame for port, held in enumerate(self.held) if port not in self.lagging)
+
+    def held_written(self, port: int, frame: int) -> bool:
+        # Blocks until every port that's keeping up has held frame or newer, False if it timed out
+        with self._cond:
+            self.held[port] = max(self.held[port], frame)
+            self.newest = max(self.newest, frame)
+            if self.held[port] >= self.newest:
+                self.lagging.discard(port)
+            self._cond.notify_all()
+            if self._cond.wait_for(lambda: self._reached(frame), timeout=self.timeout):
+                return True
+            self.lagging.update(other for other, held in enumerate(self.held) if held < frame)
+            self.late_flips += 1
+            return False
+
+    def retire(self, port: int) -> None:
+        with self._cond:
+            self.held[port] = float("inf")
+            self._cond.notify_all()
+
+
+class PortWriter(threading.Thread):
+    """
+    Writes one panel's packets on its own thread. Items are (frame, [(command, payload, hold), ...]) for one frame,
+    if the port falls behind only the newest frame is kept. With a FrameSync a frame number means the packets are
+    held, and once every port has written its own the frame is shown with a CMD_FLIP. Flips only ever follow the
+    held packets they're for, so a flip can't show a newer frame early. frame None skips the flip, e.g. CMD_IDLE.
+    """
+    GET_TIMEOUT = .1
+
+    def __init__(self, panel: Panel, sync: FrameSync = None, port: int = 0):
+        super().__init__(name=f"writer {panel.name}", daemon=True)
+        self.panel = panel
+        self.sync = sync
+        self.port = port
+        self.queue = LatestQueue(1)
+        self.written = 0
+        self.max_write_time = 0.0
+        self.error = None
+        self._stop_event = threading.Event()
+
+    def _write(self, packets: list) -> None:
+        write_start = time.perf_counter()
+        for command, payload, hold in packets:
+            self.panel.link.send(command, payload, hold=hold)
+        self.max_write_time = max(self.max_write_time, time.perf_counter() - write_start)
+
+    def run(self) -> None:
+        try:
+            while not self._stop_event.is_set():
+                item = self.queue.get(timeout=self.GET_TIMEOUT)
+                if item is None:
+                    continue
+                frame, packets = item
+                self._write(packets)
+                if frame is not None and self.sync is not None:
+                    self.sync.held_written(self.port, frame)
+                    self._write([(protocol.CMD_FLIP, b"", False)])
+                self.written += 1
+                # Keep the reply buffer drained, acks and status replies land on the Talker
+                self.panel.link.poll_replies()
+        except Exception as e:
+            # Surface the error through stats() rather than dying silently
+            self.error = e
+            raise
+        finally:
+            # Don't hold the other ports' flips up waiting for this one
+            if self.sync is not None:
+                self.sync.retire(self.port)
+
+    def stop(self) -> None:
+        self._stop_event.set()
+
+    def stats(self) -> dict:
+        return {
+            "written": self.written,
+            "suppressed": self.panel.gate.suppressed,
+            "dropped": self.queue.dropped,
+            "max_write_ms": self.max_write_time * 1000,
+            "error": repr(self.error) if self.error is not None else None,
+        }
+
+
+class PanelGroup:
+    """
+    Stands in for a single Talker in face_track, send_frame() maps the pose onto every panel and queues it on each
+    port's writer without blocking.
+    """
+    def __init__(self, panels: list):
+        self.panels = list(panels)
+        # Frame sync is only worth the extra packet when there's more than one panel to keep in step
+        self.sync = FrameSync(len(self.panels)) if len(self.panels) > 1 else None
+        self.writers = [PortWriter(panel, sync=self.sync, port=port) for port, panel in enumerate(self.panels)]
+        self.frame = 0
+        for writer in self.writers:
+            writer.start()
+
+    def send_frame(self, pose_dict: dict) -> None:
+        synced = self.sync is not None
+        frames = [[(command, payload, synced) for command, payload in panel.frame_packets(pose_dict)]
+                  for panel in self.panels]
+        if not any(frames):
+            return
+
+        self.frame += 1
+        for packets, writer in zip(frames, self.writers):
+            if synced:
+                # Panels that don't change still get the flip, every port has to reach the frame to show it
+                writer.queue.put((self.frame, packets))
+            elif packets:
+                writer.queue.put((None, packets))
+
+    def start_idle(self) -> None:
+        for panel, writer in zip(self.panels, self.writers):
+            panel.gate.reset()
+            writer.queue.put((None, [(protocol.CMD_IDLE, b"", False)]))
+
+    def stats(self) -> dict:
+        stats = {panel.name: writer.stats() for panel, writer in zip(self.panels, self.writers)}
+        if self.sync is not None:
+            stats["late_flips"] = self.sync.late_flips
+        return stats
+
+    def close(self) -> None:
+        for writer in self.writers:
+            writer.stop()
+        for writer in self.writers:
+            writer.join(timeout=1)
+        for panel in self.panels:
+            panel.link.close()
+
+
+def parse_panel_spec(spec: str) -> Panel:
+    """
+    ROLE:PORT[:OPTION,...] where the options are "pose" to stream the pose and "mirror" to flip the glances,
+    e.g. eye:/dev/ttyACM0:mirror or mouth:/dev/ttyACM1:pose
+    """
+    role, _, rest = spec.partition(":")
+    port, _, options = rest.partition(":")
+    if role not in expressions.ROLES:
+        raise ValueError(f"unknown panel role {role}, expected one of {', '.join(expressions.ROLES)}")
+    if not port:
+        raise ValueError(f"panel {spec} needs a port, ROLE:PORT[:OPTIONS]")
+    options = set(filter(None, options.split(",")))
+    unknown = options - {"pose", "mirror"}
+    if unknown:
+        raise ValueError(f"unknown panel options {', '.join(sorted(unknown))}")
+
+    return Panel(talker.Talker(port), role=role, stream_pose="pose" in options, mirror="mirror" in options)
@@ -0,0 +1,169 @@
+"""
+Trans Rights are Human Rights
+
+Runs the Pico's main.py under CPython against a fake picounicorn, so the Pico end of the serial protocol can be run on
+    any Linux box. The emulator sits on the master end of a pseudo-terminal, point a Talker (or face_track.py --port)
+    at the other end.
+
+    python pico_emulator.py
+    python pico_emulator.py --log frames.jsonl
+"""
+# SYSTEM IMPORTS
+import argparse
+import json
+import os
+import pathlib
+import pty
+import signal
+import sys
+import time
+import tty
+import types
+
+# STANDARD LIBRARY IMPORTS
+
+# LOCAL APPLICATION IMPORTS
+
+REPO_DIR = pathlib.Path(__file__).resolve().parent
+# main.py loads sprites.bin from its working directory, like it does from the root of the Pico's filesystem
+ASSETS_DIR = REPO_DIR / "assets"
+
+# MicroPython's ticks_ms() wraps at 2**30
+TICKS_PERIOD = 1 << 30
+
+
+class FakeUnicorn:
+    """
+    Stands in for the picounicorn module. Keeps what the panel is showing and timestamps every set_pixel with
+    time.monotonic_ns(), which is the same clock in every process on the machine.
+    """
+    WIDTH = 16
+    HEIGHT = 7
+
+    def __init__(self):
+        self.pixels = bytearray(self.WIDTH * self.HEIGHT * 3)
+        self.pixels_set = 0
+        self.last_set_ns = 0
+
+    def init(self) -> None:
+        pass
+
+    def get_width(self) -> int:
+        return self.WIDTH
+
+    def get_height(self) -> int:
+        return self.HEIGHT
+
+    def set_pixel(self, x: int, y: int, r: int, g: int, b: int) -> None:
+        i = (y * self.WIDTH + x) * 3
+        self.pixels[i] = r
+        self.pixels[i + 1] = g
+        self.pixels[i + 2] = b
+        self.pixels_set += 1
+        self.last_set_ns = time.monotonic_ns()
+
+
+def ticks_ms() -> int:
+    return (time.monotonic_ns() // 1000000) % TICKS_PERIOD
+
+
+def ticks_add(ticks: int, delta: int) -> int:
+    return (ticks + delta) % TICKS_PERIOD
+
+
+def ticks_diff(ticks_a: int, ticks_b: int) -> int:
+    half_period = TICKS_PERIOD // 2
+    return ((ticks_a - ticks_b + half_period) % TICKS_PERIOD) - half_period
+
+
+def load_main(panel: FakeUnicorn):
+    # Installs the MicroPython only modules and time functions main.py uses, then imports it
+    micropython = types.ModuleType("micropython")
+    micropython.kbd_intr = lambda char: None
+    micropython.const = lambda value: value
+    sys.modules["micropython"] = micropython
+    sys.modules["picounicorn"] = panel
+    time.ticks_ms = ticks_ms
+    time.ticks_add = ticks_add
+    time.ticks_diff = ticks_diff
+
+    if str(REPO_DIR) not in sys.path:
+        sys.path.insert(0, str(REPO_DIR))
+    cwd = os.getcwd()
+    os.chdir(ASSETS_DIR)
+    try:
+        import main
+    finally:
+        os.chdir(cwd)
+
+    return main
+
+
+def log_frames(main, panel: FakeUnicorn, log) -> None:
+    """
+    Wraps main.handle_packet so every frame packet writes a JSON line to log with its sequence number, when
+    it was decoded, when the panel finished drawing it and how many pixels changed. Held frames are logged when the
+    CMD_FLIP that shows them arrives.
+    """
+    handle_packet = main.handle_packet
+    frame_commands = (main.CMD_SHOW_SPRITE, main.CMD_POSE, main.CMD_EXPRESSION)
+    held = []
+
+    def logged_handle_packet(command, sequence, payload, **kwargs):
+        received_ns = time.monotonic_ns()
+        pixels_before = panel.pixels_set
+        stop = handle_packet(command, sequence, payload, **kwargs)
+
+        base_command = command & main.COMMAND_MASK
+        if base_command in frame_commands and command & main.HOLD_FLAG:
+            held[:] = [(sequence, base_command, received_ns)]
+            return stop
+        if base_command == main.CMD_FLIP and held:
+            sequence, base_command, received_ns = held.pop()
+        elif base_command not in frame_commands:
+            return stop
+
+        changed = panel.pixels_set - pixels_before
+        # A frame that changes no pixels is on the panel as soon as it's been handled
+        rendered_ns = panel.last_set_ns if changed else time.monotonic_ns()
+        log.write(json.dumps({"sequence": sequence, "command": base_command, "received_ns": received_ns,
+                              "rendered_ns": rendered_ns, "pixels": changed}) + "\n")
+        return stop
+
+    main.handle_packet = logged_handle_packet
+
+
+def run_emulator(fd: int, log_path: str = None) -> None:
+    panel = FakeUnicorn()
+    main = load_main(panel)
+    log = open(log_path, "w") if log_path else None
+    if log is not None:
+        log_frames(main, panel, log)
+
+    # Stop cleanly on SIGTERM so the frame log is flushed
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    in_stream = open(fd, "rb", buffering=0, closefd=False)
+    out_stream = open(fd, "wb", buffering=0, closefd=False)
+    try:
+        main.run_receiver(in_stream, out_stream)
+    except (KeyboardInterrupt, OSError):
+        # OSError is the host closing its end of the pty
+        pass
+    finally:
+        if log is not None:
+            log.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run main.py against a fake Unicorn panel over a pseudo-terminal")
+    parser.add_argument("--fd", type=int, help="master pty file descriptor to use, one is made if not given")
+    parser.add_argument("--log", metavar="PATH", help="write a JSON line per rendered frame")
+    args = parser.parse_args()
+
+    fd = args.fd
+    if fd is None:
+        fd, slave_fd = pty.openpty()
+        tty.setraw(slave_fd)
+        print(f"Emulated Pico on {os.ttyname(slave_fd)}", flush=True)
+
+    run_emulator(fd, log_path=args.log)
@@ -0,0 +1,156 @@
+"""
+Trans Rights are Human Rights
+
+A small threaded pipeline runtime. Each stage runs on its own thread and stages are joined by bounded
+    "latest frame wins" queues, so a slow stage drops stale work instead of holding up the stages before it.
+"""
+# SYSTEM IMPORTS
+import collections
+import threading
+import time
+
+# STANDARD LIBRARY IMPORTS
+
+# LOCAL APPLICATION IMPORTS
+from decs import profiler
+
+
+class LatestQueue:
+    """
+    Bounded queue where put() never blocks, if the queue is full the oldest item is thrown away.
+    """
+    def __init__(self, maxsize: int = 1):
+        self.maxsize = maxsize
+        self.dropped = 0
+        self._items = collections.deque()
+        self._cond = threading.Condition()
+
+    def put(self, item) -> None:
+        with self._cond:
+            if len(self._items) >= self.maxsize:
+                self._items.popleft()
+                self.dropped += 1
+            self._items.append(item)
+            self._cond.notify()
+
+    def get(self, timeout: float = None):
+        # Returns None if nothing arrived before the timeout
+        with self._cond:
+            if not self._items and not self._cond.wait_for(lambda: self._items, timeout=timeout):
+                return None
+            return self._items.popleft()
+
+    def depth(self) -> int:
+        return len(self._items)
+
+
+class Stage(threading.Thread):
+    """
+    Runs func on every item from in_queue and puts non-None results on out_queue.
+    A stage with no in_queue is a source, func is called with no arguments in a loop.
+    """
+    GET_TIMEOUT = .1
+    RATE_WINDOW = 60
+
+    def __init__(self, name: str, func, in_queue: LatestQueue = None, out_queue: LatestQueue = None):
+        super().__init__(name=name, daemon=True)
+        self.func = func
+        self.in_queue = in_queue
+        self.out_queue = out_queue
+        self.processed = 0
+        self.busy_time = 0.0
+        self.error = None
+        self._stop_event = threading.Event()
+        self._done_times = collections.deque(maxlen=self.RATE_WINDOW)
+
+    def run(self) -> None:
+        try:
+            while not self._stop_event.is_set():
+                if self.in_queue is None:
+                    item_start = time.perf_counter()
+                    result = self.func()
+                else:
+                    item = self.in_queue.get(timeout=self.GET_TIMEOUT)
+                    if item is None:
+                        continue
+                    item_start = time.perf_counter()
+                    result = self.func(item)
+
+                item_end = time.perf_counter()
+                self.busy_time += item_end - item_start
+                profiler.record(self.name, int((item_end - item_start) * 1e9))
+                self.processed += 1
+                self._done_times.append(item_end)
+
+                if result is not None and self.out_queue is not None:
+                    self.out_queue.put(result)
+        except Exception as e:
+            # Surface the error through stats() and stop the stage rather than dying silently
+            self.error = e
+            raise
+
+    def stop(self) -> None:
+        self._stop_event.set()
+
+    def throughput(self) -> float:
+        # Items per second over the last RATE_WINDOW items
+        if len(self._done_times) < 2:
+            return 0.0
+        elapsed = self._done_times[-1] - self._done_times[0]
+        return (len(self._done_times) - 1) / elapsed if elapsed > 0 else 0.0
+
+    def stats(self) -> dict:
+        return {
+            "fps": self.throughput(),
+            "processed": self.processed,
+            "avg_ms": (self.busy_time / self.processed * 1000) if self.processed else 0.0,
+            "queue_depth": self.in_queue.depth() if self.in_queue is not None else 0,
+            "dropped": self.in_queue.dropped if self.in_queue is not None else 0,
+            "error": repr(self.error) if self.error is not None else None,
+        }
+
+
+class Pipeline:
+    def __init__(self, queue_size: int = 1):
+        self.queue_size = queue_size
+        self.stages = []
+
+    def add_stage(self, name: str, func) -> Stage:
+        # Chains the new stage onto the output queue of the previous one
+        in_queue = None
+        if self.stages:
+            in_queue = LatestQueue(self.queue_size)
+            self.stages[-1].out_queue = in_queue
+        stage = Stage(name, func, in_queue=in_queue)
+        self.stages.append(stage)
+
+        return stage
+
+    def start(self) -> None:
+        for stage in self.stages:
+            stage.start()
+
+    def stop(self, timeout: float = 1.0) -> None:
+        for stage in self.stages:
+            stage.stop()
+        for stage in self.stages:
+            if stage.is_alive():
+                stage.join(timeout=timeout)
+
+    def is_alive(self) -> bool:
+        return all(stage.is_alive() for stage in self.stages)
+
+    def stats(self) -> dict:
+        return {stage.name: stage.stats() for stage in self.stages}
+
+    def bottleneck(self) -> str:
+        # The stage with the highest average time per item is the one limiting the frame rate
+        busiest = max(self.stages, key=lambda stage: stage.stats()["avg_ms"], default=None)
+        return busiest.name if busiest is not None else ""
+
+    def format_stats(self) -> str:
+        parts = []
+        for name, stats in self.stats().items():
+            parts.append(f"{name}: {stats['fps']:.1f}fps {stats['avg_ms']:.1f}ms "
+                         f"q{stats['queue_depth']} drop{stats['dropped']}")
+        return " | ".join(parts) + f" | bottleneck: {self.bottleneck()}"
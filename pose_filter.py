@@ -0,0 +1,169 @@
+"""
+Trans Rights are Human Rights
+
+Filtering between pose_handler and the output. PoseFilter smooths every pose channel with a One Euro filter (an
+    adaptive low pass, heavy smoothing when a value is still and little when it moves fast) and extrapolates each
+    channel along its smoothed velocity by the measured pipeline latency. OutputGate skips sending anything that
+    wouldn't change what the panel shows, so bytes jittering by a step or two don't keep it busy.
+"""
+# SYSTEM IMPORTS
+import math
+import time
+
+# STANDARD LIBRARY IMPORTS
+import numpy
+
+# LOCAL APPLICATION IMPORTS
+
+
+class OneEuroFilter:
+    """
+    One Euro filter over a vector of channels, see Casiez et al. 2012.
+    min_cutoff (Hz) sets the smoothing when still, beta how fast the cutoff opens up with speed, both can be
+    per channel arrays.
+    """
+    # A gap this long (seconds) means tracking was lost, start again rather than smoothing across it
+    RESET_AFTER = .5
+
+    def __init__(self, min_cutoff=1.0, beta=.5, d_cutoff: float = 1.0):
+        self.min_cutoff = numpy.asarray(min_cutoff, dtype=numpy.float64)
+        self.beta = numpy.asarray(beta, dtype=numpy.float64)
+        self.d_cutoff = d_cutoff
+        self.reset()
+
+    def reset(self) -> None:
+        self.x_hat = None
+        self.dx_hat = None
+        self.timestamp = None
+
+    @staticmethod
+    def _alpha(dt: float, cutoff):
+        tau = 1.0 / (2 * math.pi * cutoff)
+        return 1.0 / (1.0 + tau / dt)
+
+    def __call__(self, values: numpy.ndarray, timestamp: float) -> numpy.ndarray:
+        if self.x_hat is None or timestamp - self.timestamp > self.RESET_AFTER:
+            self.x_hat = numpy.array(values, dtype=numpy.float64)
+            self.dx_hat = numpy.zeros_like(self.x_hat)
+            self.timestamp = timestamp
+            return self.x_hat
+
+        dt = max(timestamp - self.timestamp, 1e-6)
+        self.timestamp = timestamp
+
+        dx = (values - self.x_hat) / dt
+        self.dx_hat += self._alpha(dt, self.d_cutoff) * (dx - self.dx_hat)
+        cutoff = self.min_cutoff + self.beta * numpy.abs(self.dx_hat)
+        self.x_hat += self._alpha(dt, cutoff) * (values - self.x_hat)
+
+        return self.x_hat
+
+
+class PoseFilter:
+    """
+    Call with each pose_dict from pose_handler and the time its frame was captured, returns a new pose_dict that's
+    smoothed and predicted forward by the pipeline latency. Report how long each frame took to get from capture to
+    the output with observe_latency() and the prediction follows it.
+    extra_lead (seconds) covers lag the host can't see, e.g. camera exposure and the serial link.
+    """
+    # Head angles are in degrees rather than 0-1, this brings their speeds into the same range for beta
+    ANGLE_SCALE = 90.0
+    LATENCY_EMA_ALPHA = .1
+
+    def __init__(self, min_cutoff: float = 1.0, beta: float = 10.0, d_cutoff: float = 1.0, extra_lead: float = 0.0,
+                 max_lead: float = .15):
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+        self.extra_lead = extra_lead
+        self.max_lead = max_lead
+        self.latency = None
+
+        self._channels = None
+        self._metric_filter = None
+        self._head_filter = OneEuroFilter(min_cutoff, beta / self.ANGLE_SCALE, d_cutoff)
+
+    @property
+    def lead_time(self) -> float:
+        return min((self.latency or 0.0) + self.extra_lead, self.max_lead)
+
+    def observe_latency(self, seconds: float) -> None:
+        if self.latency is None:
+            self.latency = seconds
+        else:
+            self.latency += self.LATENCY_EMA_ALPHA * (seconds - self.latency)
+
+    def reset(self) -> None:
+        if self._metric_filter is not None:
+            self._metric_filter.reset()
+        self._head_filter.reset()
+
+    def __call__(self, pose_dict: dict, timestamp: float) -> dict:
+        channels = [(group, key) for group, values in pose_dict.items() if group != "head" for key in values]
+        if channels != self._channels:
+            self._channels = channels
+            self._metric_filter = OneEuroFilter(self.min_cutoff, self.beta, self.d_cutoff)
+
+        lead = self.lead_time
+        values = numpy.fromiter((pose_dict[group][key] for group, key in channels), dtype=numpy.float64,
+                                count=len(channels))
+        smoothed = self._metric_filter(values, timestamp)
+        predicted = numpy.clip(smoothed + self._metric_filter.dx_hat * lead, 0.0, 1.0).tolist()
+
+        filtered = {}
+        for (group, key), value in zip(channels, predicted):
+            filtered.setdefault(group, {})[key] = value
+
+        head = pose_dict.get("head")
+        if head is None:
+            self._head_filter.reset()
+        else:
+            angles = self._head_filter(numpy.array((head["pitch"], head["yaw"], head["roll"])), timestamp)
+            pitch, yaw, roll = (angles + self._head_filter.dx_hat * lead).tolist()
+            filtered["head"] = {"pitch": pitch, "yaw": yaw, "roll": roll}
+
+        return filtered
+
+
+class OutputGate:
+    """
+    Decides whether an output message is worth sending. Messages are sprite names or quantized pose payloads,
+    a payload only counts as changed if a byte moved more than deadband since the last one sent. Bytes at the
+    signed_bytes positions are compared as -128 to 127, e.g. protocol.POSE_SIGNED_BYTES for head yaw.
+    Something is always sent every keepalive seconds, so the Pico's live hold (LIVE_HOLD_MS) never runs out.
+    """
+    def __init__(self, keepalive: float = .25, deadband: int = 2, signed_bytes: tuple = ()):
+        self.keepalive = keepalive
+        self.deadband = deadband
+        self.signed_bytes = tuple(signed_bytes)
+        self.sent = 0
+        self.suppressed = 0
+        self.reset()
+
+    def reset(self) -> None:
+        # Call when the panel has been handed something else, e.g. the idle animation, so the next message goes out
+        self.last_message = None
+        self.last_sent = None
+
+    def _changed(self, message) -> bool:
+        last = self.last_message
+        if isinstance(message, bytes) and isinstance(last, bytes) and len(message) == len(last):
+            signed = {position % len(message) for position in self.signed_bytes}
+            for position, (a, b) in enumerate(zip(message, last)):
+                if position in signed:
+                    a, b = (a + 128) % 256, (b + 128) % 256
+                if abs(a - b) > self.deadband:
+                    return True
+            return False
+        return message != last
+
+    def should_send(self, message, now: float = None) -> bool:
+        now = time.perf_counter() if now is None else now
+        if self.last_sent is not None and now - self.last_sent < self.keepalive and not self._changed(message):
+            self.suppressed += 1
+            return False
+
+        self.last_message = message
+        self.last_sent = now
+        self.sent += 1
+        return True
@@ -6,11 +6,24 @@ Trans Rights are Human Rights
 import math
 
 # STANDARD LIBRARY IMPORTS
-from mediapipe.python.solutions.drawing_utils import _normalized_to_pixel_coordinates as denormalize_coordinates
 
 # LOCAL APPLICATION IMPORTS
 
 
+def denormalize_coordinates(normalized_x: float, normalized_y: float, frame_width: int,
+                            frame_height: int) -> (int, int):
+    # Same as MediaPipe's drawing_utils._normalized_to_pixel_coordinates, without having to import MediaPipe for it.
+    # Returns None if the point is outside the frame.
+    def is_valid_normalized_value(value: float) -> bool:
+        return (value > 0 or math.isclose(0, value)) and (value < 1 or math.isclose(1, value))
+
+    if not (is_valid_normalized_value(normalized_x) and is_valid_normalized_value(normalized_y)):
+        return None
+    x_px = min(math.floor(normalized_x * frame_width), frame_width - 1)
+    y_px = min(math.floor(normalized_y * frame_height), frame_height - 1)
+    return x_px, y_px
+
+
 def distance(xy_a, xy_b) -> float:
     dist = sum([(x - y) ** 2 for x, y in zip(xy_a, xy_b)]) ** 0.5
     return dist
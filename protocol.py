@@ -0,0 +1,169 @@
+"""
+Trans Rights are Human Rights
+
+Binary framed serial protocol between the host and the Pico.
+    Every packet is: SYNC(2) | command(1) | sequence(1) | length(1) | payload(length) | crc8(1)
+    The crc8 covers command, sequence, length and payload. Setting ACK_FLAG on the command asks the Pico to reply
+    with a CMD_ACK packet carrying the same sequence number. Setting HOLD_FLAG on a frame packet has the Pico
+    draw the frame but not show it until the next CMD_FLIP, so several panels can flip together.
+    main.py holds the matching receiver, keep the two in sync.
+"""
+# SYSTEM IMPORTS
+import struct
+
+# STANDARD LIBRARY IMPORTS
+
+# LOCAL APPLICATION IMPORTS
+import atlas
+
+
+SYNC = b"\xa5\x5a"
+HEADER_SIZE = len(SYNC) + 3
+MAX_PAYLOAD = 255
+
+ACK_FLAG = 0x80
+HOLD_FLAG = 0x40
+# Only host to Pico commands carry flags, CMD_ACK only ever comes back from the Pico
+COMMAND_MASK = 0x3f
+CMD_PING = 0x00
+CMD_SHOW_SPRITE = 0x01
+# Asks the Pico for a status reply, payload "<HHH": missed animation deadlines, worst lateness ms, corrupt packets
+CMD_STATUS = 0x02
+# Whole pose as quantized bytes, see POSE_FIELDS and encode_pose
+CMD_POSE = 0x03
+# Host has lost the face, the Pico drops the live frame and plays its own idle animation until live packets resume
+CMD_IDLE = 0x04
+# Frame sync marker, shows the frame held by the last HOLD_FLAG packet. No payload, the host only sends it after the
+# held packets it's for, so a flip never overtakes a newer held frame
+CMD_FLIP = 0x05
+# Expression cell from expressions.py as a little endian uint16, every panel shows its own role's frame for it
+CMD_EXPRESSION = 0x06
+# Stops main.py's receiver and turns Ctrl-C back on, so mpremote can get to the REPL to copy new files over
+CMD_EXIT = 0x07
+CMD_ACK = 0x7f
+# Commands that put a new frame on the panel
+FRAME_COMMANDS = (CMD_SHOW_SPRITE, CMD_POSE, CMD_EXPRESSION)
+
+# Sprite IDs used by CMD_SHOW_SPRITE are the sprite's position in the atlas built by image_convert.py
+try:
+    SPRITE_NAMES = atlas.load_sprite_names()
+except OSError:
+    SPRITE_NAMES = ["eye_angry", "eye_backward", "eye_blink", "eye_forward", "eye_static",
+                    "mouth_closed", "mouth_open", "mouth_open_wide"]
+SPRITE_IDS = {name: sprite_id for sprite_id, name in enumerate(SPRITE_NAMES)}
+
+
+# (pose_dict group, key) for each CMD_POSE byte, 0-1 values are quantized to 0-255.
+# The last byte is head yaw in whole degrees as a signed byte. main.py reads these by position.
+POSE_FIELDS = [
+    ("eye_left", "open_amount"),
+    ("eye_right", "open_amount"),
+    ("mouth", "open_amount"),
+    ("mouth", "wide_amount"),
+    ("eyebrow_left", "inner_raise"),
+    ("eyebrow_right", "inner_raise"),
+    ("eyebrow_left", "mid_raise"),
+    ("eyebrow_right", "mid_raise"),
+    ("eye_left", "iris_distance"),
+    ("eye_right", "iris_distance"),
+]
+POSE_PAYLOAD_SIZE = len(POSE_FIELDS) + 1
+# Positions of the signed bytes in a pose payload, for comparing payloads, see pose_filter.OutputGate
+POSE_SIGNED_BYTES = (len(POSE_FIELDS),)
+# Sent for fields a tracking profile doesn't track, eyes open and everything else at rest
+POSE_FIELD_DEFAULTS = {("eye_left", "open_amount"): 1.0, ("eye_right", "open_amount"): 1.0,
+                       ("mouth", "open_amount"): 0.0, ("mouth", "wide_amount"): 0.0}
+
+
+def encode_pose(pose_dict: dict) -> bytes:
+    payload = bytearray(POSE_PAYLOAD_SIZE)
+    for position, (group, key) in enumerate(POSE_FIELDS):
+        value = pose_dict.get(group, {}).get(key)
+        if value is None:
+            value = POSE_FIELD_DEFAULTS.get((group, key), .5)
+        payload[position] = min(255, max(0, int(value * 255 + .5)))
+
+    head = pose_dict.get("head")
+    yaw = int(round(head["yaw"])) if head is not None else 0
+    payload[-1] = max(-127, min(127, yaw)) & 0xff
+
+    return bytes(payload)
+
+
+def encode_expression(cell: int) -> bytes:
+    return struct.pack("<H", cell)
+
+
+def _build_crc8_table() -> bytes:
+    # CRC-8, polynomial 0x07
+    table = bytearray(256)
+    for byte in range(256):
+        crc = byte
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x07) & 0xff if crc & 0x80 else (crc << 1) & 0xff
+        table[byte] = crc
+    return bytes(table)
+
+
+CRC8_TABLE = _build_crc8_table()
+
+
+def crc8(data, crc: int = 0) -> int:
+    for byte in data:
+        crc = CRC8_TABLE[crc ^ byte]
+    return crc
+
+
+def encode_packet(command: int, payload: bytes = b"", sequence: int = 0, want_ack: bool = False,
+                  hold: bool = False) -> bytes:
+    if len(payload) > MAX_PAYLOAD:
+        raise ValueError(f"payload is {len(payload)} bytes, the maximum is {MAX_PAYLOAD}")
+    if want_ack:
+        command |= ACK_FLAG
+    if hold:
+        command |= HOLD_FLAG
+    body = bytes((command, sequence & 0xff, len(payload))) + payload
+    return SYNC + body + bytes((crc8(body),))
+
+
+class PacketDecoder:
+    """
+    Incremental decoder, feed() it whatever bytes arrived and it returns the complete packets as
+        (command, sequence, payload) tuples. Corrupt packets are counted in bad_packets and skipped.
+    """
+    def __init__(self):
+        self.buffer = bytearray()
+        self.bad_packets = 0
+
+    def feed(self, data: bytes) -> list:
+        self.buffer.extend(data)
+        packets = []
+        buffer = self.buffer
+
+        while True:
+            start = buffer.find(SYNC)
+            if start < 0:
+                # Keep a trailing half sync byte in case the rest of it is in the next read
+                del buffer[:max(len(buffer) - 1, 0)]
+                break
+            if start:
+                del buffer[:start]
+            if len(buffer) < HEADER_SIZE:
+                break
+
+            length = buffer[4]
+            packet_end = HEADER_SIZE + length + 1
+            if len(buffer) < packet_end:
+                break
+
+            body = bytes(buffer[2:packet_end - 1])
+            if crc8(body) != buffer[packet_end - 1]:
+                self.bad_packets += 1
+                # Skip this sync and look for the next one, the length byte can't be trusted
+                del buffer[:1]
+                continue
+
+            packets.append((body[0], body[1], body[3:]))
+            del buffer[:packet_end]
+
+        return packets
@@ -0,0 +1,138 @@
+"""
+Trans Rights are Human Rights
+
+Records FaceMesh landmark streams to disk so the pose math can be replayed and benchmarked without a webcam.
+    A recording is a 32 byte header followed by fixed size records of
+    (timestamp float64, landmarks float32[n_landmarks][3]), so it can be memory mapped straight into numpy.
+"""
+# SYSTEM IMPORTS
+import os
+import struct
+import time
+
+# STANDARD LIBRARY IMPORTS
+import numpy
+
+# LOCAL APPLICATION IMPORTS
+
+
+MAGIC = b"PLMK"
+VERSION = 1
+# magic, version, reserved, landmark count, frame width, frame height, tracking profile name (empty if unknown)
+HEADER_FORMAT = "<4sHHIII12s"
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+FACEMESH_LANDMARKS = 478
+
+
+def record_dtype(n_landmarks: int) -> numpy.dtype:
+    return numpy.dtype([("timestamp", "<f8"), ("points", "<f4", (n_landmarks, 3))])
+
+
+def landmarks_to_array(landmark_list, out: numpy.ndarray = None) -> numpy.ndarray:
+    # Copies a full MediaPipe landmark list into an (N, 3) array, only used when recording
+    if out is None:
+        out = numpy.empty((len(landmark_list), 3), dtype=numpy.float32)
+    for index, landmark in enumerate(landmark_list):
+        out[index, 0] = landmark.x
+        out[index, 1] = landmark.y
+        out[index, 2] = landmark.z
+    return out
+
+
+class LandmarkRecorder:
+    """
+    Buffers frames in memory and writes them out chunk_size frames at a time.
+    Use as a context manager, or call close() to flush the last chunk.
+    """
+    def __init__(self, path, frame_width: int, frame_height: int,
+                 n_landmarks: int = FACEMESH_LANDMARKS, chunk_size: int = 256, profile: str = ""):
+        self.path = path
+        self.n_landmarks = n_landmarks
+        self.chunk = numpy.zeros(chunk_size, dtype=record_dtype(n_landmarks))
+        self.chunk_fill = 0
+        self.frames_written = 0
+        self.file = open(path, "wb")
+        self.file.write(struct.pack(HEADER_FORMAT, MAGIC, VERSION, 0, n_landmarks, frame_width, frame_height,
+                                    profile.encode("ascii")))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def add_points(self, points: numpy.ndarray, timestamp: float = None) -> None:
+        self.chunk["points"][self.chunk_fill] = points
+        self._commit_frame(timestamp)
+
+    def add_landmarks(self, landmark_list, timestamp: float = None, transform=None) -> None:
+        # transform is called on the (N, 3) points in place, e.g. to map a cropped frame back to the full frame
+        points = landmarks_to_array(landmark_list, out=self.chunk["points"][self.chunk_fill])
+        if transform is not None:
+            transform(points)
+        self._commit_frame(timestamp)
+
+    def _commit_frame(self, timestamp: float) -> None:
+        self.chunk["timestamp"][self.chunk_fill] = time.perf_counter() if timestamp is None else timestamp
+        self.chunk_fill += 1
+        if self.chunk_fill == len(self.chunk):
+            self.flush()
+
+    def flush(self) -> None:
+        if self.chunk_fill:
+            self.file.write(self.chunk[:self.chunk_fill].tobytes())
+            self.frames_written += self.chunk_fill
+            self.chunk_fill = 0
+        self.file.flush()
+
+    def close(self) -> None:
+        if not self.file.closed:
+            self.flush()
+            self.file.close()
+
+
+class Recording:
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            magic, version, _, n_landmarks, frame_width, frame_height, profile = struct.unpack(
+                HEADER_FORMAT, f.read(HEADER_SIZE))
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} landmark recording")
+
+        self.path = path
+        self.n_landmarks = n_landmarks
+        self.frame_width = frame_width
+        self.frame_height = frame_height
+        # The face_track.TRACKING_PROFILES name it was recorded with, "" for recordings that didn't store one
+        self.profile = profile.rstrip(b"\0").decode("ascii")
+        dtype = record_dtype(n_landmarks)
+        if os.path.getsize(path) - HEADER_SIZE < dtype.itemsize:
+            # numpy can't memory map an empty region
+            self.records = numpy.zeros(0, dtype=dtype)
+        else:
+            self.records = numpy.memmap(path, dtype=dtype, mode="r", offset=HEADER_SIZE)
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    @property
+    def timestamps(self) -> numpy.ndarray:
+        return self.records["timestamp"]
+
+    @property
+    def points(self) -> numpy.ndarray:
+        # (frames, n_landmarks, 3) float32, memory mapped
+        return self.records["points"]
+
+
+def write_synthetic_recording(path, frames: int = 1000, frame_width: int = 640, frame_height: int = 480,
+                              seed: int = 0) -> None:
+    # A random walk of landmarks, good enough to time the pose math on machines with no recorded sessions
+    rng = numpy.random.default_rng(seed)
+    base = rng.uniform(.2, .8, size=(FACEMESH_LANDMARKS, 3)).astype(numpy.float32)
+    base[:, 2] -= .5
+    with LandmarkRecorder(path, frame_width, frame_height) as recorder:
+        for frame in range(frames):
+            jitter = rng.normal(0, .002, size=base.shape).astype(numpy.float32)
+            base += jitter
+            recorder.add_points(base, timestamp=frame / 30)
@@ -4,36 +4,168 @@ Trans Rights are Human Rights
 Short script to handle serial data over USB
 """
 # SYSTEM IMPORTS
-import serial
+import argparse
+import collections
+import glob
+import struct
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # STANDARD LIBRARY IMPORTS
+import serial
 
 # LOCAL APPLICATION IMPORTS
+import protocol
 
+# Where a Pico shows up on Linux, the RP2040's USB CDC port is normally ttyACM, USB serial adapters are ttyUSB
+PICO_PORT_GLOBS = ("/dev/ttyACM*", "/dev/ttyUSB*")
 
-class Talker:
-    TERMINATOR = '\r'.encode('UTF8')
 
+class Talker:
     def __init__(self, com_port: str = "COM6", timeout=1):
         self.serial = serial.Serial(com_port, 115200, timeout=timeout)
+        self.sequence = 0
+        self.decoder = protocol.PacketDecoder()
+        # sequence number -> send time, for packets that asked for an ack
+        self.pending_acks = {}
+        self.ack_latencies = collections.deque(maxlen=256)
+        self.pico_status = None
 
-    def send(self, text: str) -> None:
-        line = '%s\r\f' % text
-        self.serial.write(line.encode('utf-8'))
-        reply = self.receive()
-        reply = reply.replace('>>> ', '')  # lines after first will be prefixed by a prompt
-        if reply != text:  # the line should be echoed, so the result should match
-            raise ValueError(f"expected {text} got {reply}")
+    def send(self, command: int, payload: bytes = b"", want_ack: bool = False, hold: bool = False) -> int:
+        # Writes one packet and returns straight away, there's no echo to wait for
+        sequence = self.sequence
+        self.sequence = (self.sequence + 1) & 0xff
+        if want_ack:
+            self.pending_acks[sequence] = time.perf_counter()
+        self.serial.write(protocol.encode_packet(command, payload, sequence=sequence, want_ack=want_ack, hold=hold))
 
-        return None
+        return sequence
+
+    def show_sprite(self, name: str, want_ack: bool = False) -> int:
+        return self.send(protocol.CMD_SHOW_SPRITE, bytes((protocol.SPRITE_IDS[name],)), want_ack=want_ack)
+
+    def show_expression(self, cell: int, want_ack: bool = False) -> int:
+        return self.send(protocol.CMD_EXPRESSION, protocol.encode_expression(cell), want_ack=want_ack)
+
+    def send_pose(self, pose_dict: dict, want_ack: bool = False) -> int:
+        return self.send(protocol.CMD_POSE, protocol.encode_pose(pose_dict), want_ack=want_ack)
+
+    def wait_for_ack(self, sequence: int, timeout: float) -> bool:
+        deadline = time.perf_counter() + timeout
+        while time.perf_counter() < deadline:
+            if sequence in self.poll_replies():
+                return True
+            time.sleep(.005)
+
+        self.pending_acks.pop(sequence, None)
+        return False
+
+    def ping(self, timeout: float = .5) -> bool:
+        # Handshake, True if main.py on the other end acked a CMD_PING within timeout seconds
+        return self.wait_for_ack(self.send(protocol.CMD_PING, want_ack=True), timeout)
+
+    def start_idle(self, want_ack: bool = False) -> int:
+        # Hands the panel over to the Pico's own idle animation until the next sprite or pose
+        return self.send(protocol.CMD_IDLE, want_ack=want_ack)
+
+    def request_status(self) -> int:
+        # The reply is picked up by poll_replies() and lands in self.pico_status
+        return self.send(protocol.CMD_STATUS)
+
+    def poll_replies(self) -> list:
+        # Non-blocking, reads whatever the Pico has sent back and returns the acked sequence numbers
+        waiting = self.serial.in_waiting
+        if not waiting:
+            return []
+
+        acked = []
+        now = time.perf_counter()
+        for command, sequence, payload in self.decoder.feed(self.serial.read(waiting)):
+            if command == protocol.CMD_STATUS:
+                missed, max_lateness_ms, bad_packets = struct.unpack("<HHH", payload)
+                self.pico_status = {"missed_deadlines": missed, "max_lateness_ms": max_lateness_ms,
+                                    "bad_packets": bad_packets}
+            elif command == protocol.CMD_ACK:
+                sent_time = self.pending_acks.pop(sequence, None)
+                if sent_time is not None:
+                    self.ack_latencies.append(now - sent_time)
+                acked.append(sequence)
 
-    def receive(self) -> str:
-        line = self.serial.read_until(self.TERMINATOR)
-        decoded_line = line.decode("UTF8").strip()
+        return acked
 
-        return decoded_line
+    def exit_to_repl(self, timeout: float = .5) -> bool:
+        # Stops main.py so the Pico drops back to the REPL, True once it's acked. Needed before mpremote can update it
+        return self.wait_for_ack(self.send(protocol.CMD_EXIT, want_ack=True), timeout)
 
     def close(self) -> None:
         self.serial.close()
 
         return None
+
+
+def candidate_ports() -> list:
+    ports = []
+    for pattern in PICO_PORT_GLOBS:
+        ports.extend(sorted(glob.glob(pattern)))
+    if not ports and sys.platform == "win32":
+        # Windows COM ports don't match the globs, ask pyserial what's there instead
+        from serial.tools import list_ports
+        ports = [port.device for port in list_ports.comports()]
+
+    return ports
+
+
+def _probe(com_port: str, timeout: float) -> Talker:
+    try:
+        talker = Talker(com_port, timeout=timeout)
+    except (serial.SerialException, OSError):
+        return None
+    if talker.ping(timeout=timeout):
+        return talker
+    talker.close()
+
+    return None
+
+
+def find_pico(ports: list = None, timeout: float = .5) -> Talker:
+    """
+    Probes every candidate port at once with a CMD_PING handshake and returns a Talker on the first one that answers,
+    so finding the Pico takes one timeout no matter how many serial devices are plugged in.
+    Raises serial.SerialException if nothing answers.
+    """
+    ports = candidate_ports() if ports is None else list(ports)
+    if not ports:
+        raise serial.SerialException("no serial ports to look for the Pico on")
+
+    found = None
+    with ThreadPoolExecutor(max_workers=len(ports)) as pool:
+        for future in as_completed([pool.submit(_probe, port, timeout) for port in ports]):
+            talker = future.result()
+            if talker is None:
+                continue
+            if found is None:
+                found = talker
+            else:
+                talker.close()
+
+    if found is None:
+        raise serial.SerialException(f"no Pico answered on {', '.join(ports)}")
+
+    return found
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Talk to main.py on the Pico")
+    parser.add_argument("--port", help="serial port of the Pico, found automatically if not given")
+    parser.add_argument("--exit", action="store_true", help="stop main.py and hand the Pico back to the REPL")
+    args = parser.parse_args()
+
+    link = Talker(args.port) if args.port else find_pico()
+    try:
+        if args.exit:
+            print("main.py stopped" if link.exit_to_repl() else "no ack, main.py may not be running")
+        else:
+            print(f"main.py answered on {link.serial.port}" if link.ping() else "no answer")
+    finally:
+        link.close()